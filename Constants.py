@@ -1,6 +1,7 @@
 import os
 
-BASE_URL = "https://vicapipro.veticareapp.com/v1/api"
+# Override with API_BASE_URL to point the pipeline at another server (e.g. mock_server.py)
+BASE_URL = os.getenv("API_BASE_URL", "https://vicapipro.veticareapp.com/v1/api")
 
 ENDPOINTS = {
     "signin":{"endpoint":f"{BASE_URL}/signin"},
@@ -19,4 +20,66 @@ HEADERS = {
 
 TIME_ZONE = "+02:00"
 
+# Number of export reports downloaded in parallel by ingest_data.fetch_all()
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", "5"))
+
+# Retries for throttled/failed API calls: exponential backoff with full jitter
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "4"))
+RETRY_BACKOFF_BASE = 1.0   # seconds, doubled on every attempt
+RETRY_MAX_DELAY = 60.0     # seconds, also caps the server's Retry-After
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Client-side token bucket shared by all API calls (0 disables rate limiting)
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "5"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "5"))
+
+# Auth token cache. Tokens are always cached in memory; set TOKEN_CACHE_FILE to
+# also reuse them across runs (the file is created with 0600 permissions).
+TOKEN_CACHE_FILE = os.getenv("TOKEN_CACHE_FILE")
+TOKEN_DEFAULT_TTL = 3600     # seconds, used when the token carries no `exp` claim
+TOKEN_EXPIRY_MARGIN = 60     # seconds, refresh tokens this long before they expire
+
+# Chunk size (bytes) for streaming export reports to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
 DATASETS_DIR = os.path.join(os.getcwd(), "data",)
+
+# Master tables. STORAGE_BACKEND is "parquet" (typed, fast to load; needs pyarrow),
+# "sqlite" (one indexed database file, transactional upserts) or "csv" (plain
+# text database/<name>.csv, the original format)
+DATABASE_DIR = os.path.join(os.getcwd(), "database")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "parquet")
+SQLITE_FILENAME = "master.sqlite"
+
+# Tables the Parquet backend stores as one file per creation_date month
+PARTITIONED_TABLES = ("revenue", "services")
+
+# Per-endpoint high-water marks for incremental ingestion
+WATERMARKS_FILE = os.path.join(DATASETS_DIR, "state", "watermarks.json")
+
+# Key -> row fingerprint index of each keyed master table (see key_index.py)
+KEY_INDEX_DIR = os.path.join(DATASETS_DIR, "state", "key_index")
+
+# One-time migrations of the master tables already applied, with their format
+# (see process_data.add_row_hash_to_table). Committed with the database.
+MIGRATIONS_FILE = os.path.join(DATASETS_DIR, "state", "migrations.json")
+
+# Client join index: revenue/pets sorted by client key plus per-client ranges and totals (see client_index.py)
+CLIENT_INDEX_FILE = os.path.join(DATASETS_DIR, "state", "client_index.pkl")
+
+# Worker processes used by process_data to clean datasets in parallel
+MAX_PROCESS_WORKERS = int(os.getenv("MAX_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+
+# Cache of cleaned frames, keyed by raw payload hash and cleaner version.
+# Bump PARSE_CACHE_VERSION when a helper shared by the cleaners changes.
+PARSE_CACHE_DIR = os.path.join(DATASETS_DIR, "cache")
+PARSE_CACHE_VERSION = 1
+
+# Service name / doctor normalization rules (see service_rules.py)
+SERVICE_RULES_FILE = os.path.join(os.getcwd(), "service_rules.json")
+
+# Content-addressed manifest of every raw payload (sha256 -> dataset, path, processed)
+RAW_MANIFEST_FILE = os.path.join(DATASETS_DIR, "raw", "manifest.json")
+
+# Window used for an endpoint that has no watermark yet
+DEFAULT_LOOKBACK_DAYS = 7
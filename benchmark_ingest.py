@@ -0,0 +1,100 @@
+import argparse
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+
+# Run against a throwaway data/ directory and the local mock API. Both are read
+# by Constants at import time, so set them up before importing the pipeline.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="ingest_bench_")
+os.chdir(WORK_DIR)
+
+with socket.socket() as _probe:
+    _probe.bind(("127.0.0.1", 0))
+    MOCK_PORT = _probe.getsockname()[1]
+os.environ["API_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}/v1/api"
+
+import mock_server
+import http_client
+import ingest_data
+from Constants import RAW_MANIFEST_FILE
+
+logger = logging.getLogger(__name__)
+
+
+def run_benchmark(rows=1000, latency=0.0, payload_format="xlsx", iterations=3, workers=(1, 5), rate_limit=True):
+    """
+    Time fetch_all() against the mock server for each worker count.
+
+    Args:
+        rows (int): Rows per synthetic report
+        latency (float): Simulated report generation time per export call
+        payload_format (str): "xlsx" or "json"
+        iterations (int): Full ingest runs per worker count
+        workers (tuple): Worker counts to compare (1 = sequential)
+        rate_limit (bool): Keep the client-side token bucket enabled
+
+    Returns:
+        list[dict]: One result row per worker count
+    """
+    server, _ = mock_server.start_server(MOCK_PORT, rows, latency, payload_format)
+
+    if not rate_limit:
+        http_client.rate_limiter.rate = 0
+
+    token = ingest_data.authenticate()
+    results = []
+    for max_workers in workers:
+        requests_done = 0
+        bytes_saved = 0
+        elapsed = 0.0
+        for _ in range(iterations):
+            # Start every run from an empty raw store so nothing is deduplicated
+            if os.path.exists(RAW_MANIFEST_FILE):
+                os.remove(RAW_MANIFEST_FILE)
+
+            start = time.perf_counter()
+            saved = ingest_data.fetch_all(token, max_workers=max_workers)
+            elapsed += time.perf_counter() - start
+
+            paths = [path for path in saved.values() if path]
+            requests_done += len(paths)
+            bytes_saved += sum(os.path.getsize(path) for path in paths)
+
+        results.append({
+            "workers": max_workers,
+            "requests": requests_done,
+            "seconds": elapsed,
+            "requests_per_s": requests_done / elapsed if elapsed else 0.0,
+            "mb_per_s": bytes_saved / elapsed / 1024 / 1024 if elapsed else 0.0
+        })
+
+    server.shutdown()
+    http_client.close_session()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest throughput against the local mock API.")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per synthetic report")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per export call")
+    parser.add_argument("--format", choices=["xlsx", "json"], default="xlsx")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--no-rate-limit", action="store_true", help="Disable the client-side rate limiter")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run_benchmark(args.rows, args.latency, args.format, args.iterations, tuple(args.workers),
+                            rate_limit=not args.no_rate_limit)
+
+    print("=" * 60)
+    print(f"INGEST BENCHMARK  rows={args.rows} latency={args.latency}s format={args.format}")
+    print("=" * 60)
+    print(f"{'workers':>8} {'requests':>9} {'seconds':>9} {'req/s':>9} {'MB/s':>9}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['requests']:>9} {r['seconds']:>9.2f} {r['requests_per_s']:>9.2f} {r['mb_per_s']:>9.2f}")
+    print(f"Raw files written under: {WORK_DIR}")
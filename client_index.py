@@ -0,0 +1,247 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+from Constants import CLIENT_INDEX_FILE
+from schema import apply_schema
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# PERSISTED CLIENT JOIN INDEX
+# ==========================================
+# Clients, their invoices and their pets share one join key: the canonical
+# phone key (clients.phone_key, revenue/pets.client_phone_key). The index in
+# data/state/client_index.pkl keeps revenue and pets projected onto the
+# columns client analysis needs, sorted by that key, plus one row per client
+# with the [start, stop) range of its rows in each projection and its
+# lifetime totals. A drill-down is then a slice and the debtor/payee panels
+# read the totals, instead of grouping the whole revenue table on every
+# render. merge_and_save patches the index with each batch.
+#
+# Invoices and clients without a phone are grouped by client name instead,
+# under a negative key derived from the name (see name_keys), so they still
+# count in the totals.
+
+KEY = "client_key"
+
+# Bump when the layout or keys of the index change, so stored indexes are rebuilt
+INDEX_FORMAT = 2
+
+# Source table -> (its client key column, its record key, projected columns)
+PROJECTIONS = {
+    "revenue": ("client_phone_key", "invoice_code",
+                ["invoice_code", "creation_date", "client", "pet_name", "category", "amount", "discount", "paid", "debit"]),
+    "pets": ("client_phone_key", "code", ["code", "pet_name", "type", "status", "creation_date"]),
+    "clients": ("phone_key", "id", ["id", "name", "creation_date"])
+}
+
+INDEXED_TABLES = tuple(PROJECTIONS)
+
+# Source table -> client name column, the fallback key of rows without a phone key
+NAME_COLUMNS = {"revenue": "client", "clients": "name"}
+
+
+def name_keys(names):
+    """
+    Fallback client keys of rows without a phone: a negative 63-bit hash of the stripped name.
+
+    Phone keys are positive, so the two never collide; missing names give <NA>.
+    """
+    text = names.astype(object).where(names.notna())
+    hashes = pd.util.hash_pandas_object(text.str.strip(), index=False).to_numpy()
+    keys = pd.Series(-(hashes >> 1).astype("int64") - 1, index=names.index).astype("Int64")
+    return keys.where(text.notna())
+
+
+def _project(name, df):
+    """Project a table's rows onto the index columns, keyed by phone key or else by client name."""
+    key_column, record_key, columns = PROJECTIONS[name]
+    df = df.drop_duplicates(subset=[record_key])
+    keys = df[key_column].astype("Int64")
+    if name in NAME_COLUMNS and keys.isna().any():
+        keys = keys.fillna(name_keys(df[NAME_COLUMNS[name]]))
+    df, keys = df[keys.notna()], keys[keys.notna()]
+    projection = df[columns].reset_index(drop=True)
+    projection.insert(0, KEY, keys.to_numpy(dtype="int64"))
+    return projection
+
+
+def _sorted(name, projection):
+    """Sort a projection by client key, then chronologically (record key breaks ties)."""
+    record_key = PROJECTIONS[name][1]
+    order = np.lexsort((
+        projection[record_key].fillna(-1).to_numpy(dtype="int64"),
+        projection["creation_date"].to_numpy(dtype="datetime64[ns]").view("int64"),
+        projection[KEY].to_numpy(),
+    ))
+    return projection.take(order).reset_index(drop=True)
+
+
+def _ranges(keys):
+    """Distinct keys of a sorted key array with the [start, stop) of each one's rows."""
+    if not len(keys):
+        return keys, np.array([], dtype="int64"), np.array([], dtype="int64")
+    starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+    stops = np.append(starts[1:], len(keys))
+    return keys[starts], starts, stops
+
+
+def _client_table(index):
+    """
+    One row per client key: id and name, row ranges in the projections and lifetime totals.
+
+    A single linear pass over the sorted projections (np.*.reduceat over
+    the ranges), no hashing group-by.
+    """
+    revenue = index["revenue"]
+    keys, starts, stops = _ranges(revenue[KEY].to_numpy())
+    by_revenue = pd.DataFrame({"revenue_start": starts, "revenue_stop": stops, "invoices": stops - starts}, index=keys)
+    if len(keys):
+        for column in ("paid", "debit"):
+            by_revenue[column] = np.add.reduceat(revenue[column].to_numpy(dtype="float64"), starts)
+        by_revenue["max_debit"] = np.maximum.reduceat(revenue["debit"].to_numpy(dtype="float64"), starts)
+        by_revenue["invoice_name"] = revenue["client"].to_numpy()[starts]
+
+    pets = index["pets"]
+    keys, starts, stops = _ranges(pets[KEY].to_numpy())
+    by_pets = pd.DataFrame({"pets_start": starts, "pets_stop": stops}, index=keys)
+
+    clients = index["clients"].drop_duplicates(subset=[KEY]).set_index(KEY)[["id", "name"]]
+    table = by_revenue.join(by_pets, how="outer").join(clients, how="outer")
+    table.index.name = KEY
+
+    # Clients with no invoices (or no pets) get an empty range
+    for column in ("revenue_start", "revenue_stop", "invoices", "pets_start", "pets_stop"):
+        table[column] = table[column].fillna(0).astype("int64")
+    for column in ("paid", "debit", "max_debit"):
+        table[column] = table[column].fillna(0.0) if column in table else 0.0
+    names = table["invoice_name"] if "invoice_name" in table else pd.Series(np.nan, index=table.index)
+    table["client"] = table["name"].fillna(names)
+    return table.drop(columns=["invoice_name"], errors="ignore").sort_index()
+
+
+def _versions(storage):
+    return {name: storage.version(name) for name in INDEXED_TABLES if storage.exists(name)}
+
+
+def build_client_index(storage):
+    """
+    Build the client join index from the stored clients, pets and revenue tables.
+
+    Returns:
+        dict: "revenue"/"pets"/"clients" sorted projections, "by_client" table, "versions"
+    """
+    index = {}
+    for name, (key_column, _, columns) in PROJECTIONS.items():
+        if storage.exists(name):
+            df = storage.read(name, columns=[key_column] + columns)
+        else:
+            df = pd.DataFrame(columns=[key_column] + columns)
+        index[name] = _sorted(name, _project(name, df))
+    index["by_client"] = _client_table(index)
+    index["versions"] = _versions(storage)
+    return index
+
+
+def load_client_index(storage, save=True):
+    """
+    Load the client join index, rebuilding it if the tables changed behind its back.
+
+    Like the key index, it records the storage version of every table it
+    was built from; a rebuild, migration, restore or backend switch changes
+    them and the index is rebuilt with one read of each table.
+
+    Args:
+        storage (Storage): Master table storage
+        save (bool): Persist a rebuilt index (readers like the dashboard pass False)
+
+    Returns:
+        dict: see build_client_index()
+    """
+    if os.path.exists(CLIENT_INDEX_FILE):
+        try:
+            index = pd.read_pickle(CLIENT_INDEX_FILE)
+            if index.get("format") == INDEX_FORMAT and index.get("versions") == _versions(storage):
+                return index
+            logger.info("🔄 Client index is out of date, rebuilding")
+        except Exception as e:
+            logger.warning(f"⚠️ Unreadable client index {CLIENT_INDEX_FILE}, rebuilding: {e}")
+
+    index = build_client_index(storage)
+    if save:
+        save_client_index(storage, index)
+    return index
+
+
+def save_client_index(storage, index):
+    """Persist the client join index for the current versions of its tables."""
+    index["format"] = INDEX_FORMAT
+    index["versions"] = _versions(storage)
+    os.makedirs(os.path.dirname(CLIENT_INDEX_FILE), exist_ok=True)
+    tmp_path = CLIENT_INDEX_FILE + ".tmp"
+    pd.to_pickle(index, tmp_path)
+    os.replace(tmp_path, CLIENT_INDEX_FILE)
+
+
+def update_client_index(index, batches):
+    """
+    Apply merged batches to the index without reading the tables.
+
+    Each batch replaces the projected rows with the same record key (an
+    updated invoice) and adds the new ones, the projection is re-sorted in
+    memory and the per-client table is recomputed in one linear pass.
+
+    Args:
+        index (dict): Index loaded before the batches were merged
+        batches (dict): table name -> cleaned rows merged into it (clients, pets, revenue)
+
+    Returns:
+        dict: the updated index
+    """
+    for name, df in batches.items():
+        if df is None or name not in PROJECTIONS:
+            continue
+        record_key = PROJECTIONS[name][1]
+        batch = _project(name, df)
+        kept = index[name][~index[name][record_key].isin(batch[record_key])]
+        # Categories of the batch and the index differ, so recast after concatenating
+        index[name] = apply_schema(name, _sorted(name, pd.concat([kept, batch], ignore_index=True)))
+    index["by_client"] = _client_table(index)
+    return index
+
+
+def stored_dates(index, name, df):
+    """creation_date the index holds for the records of df, i.e. where they were before df is merged."""
+    record_key = PROJECTIONS[name][1]
+    projection = index[name]
+    return projection.loc[projection[record_key].isin(df[record_key]), "creation_date"]
+
+
+def client_rows(index, name, client_key):
+    """
+    Return one client's revenue or pets rows, as a slice of the sorted projection.
+
+    Args:
+        index (dict): Client join index
+        name (str): "revenue" or "pets"
+        client_key (int): Canonical phone key (clients.phone_key), or name_keys() of a client without a phone
+
+    Returns:
+        pd.DataFrame
+    """
+    by_client = index["by_client"]
+    if client_key not in by_client.index:
+        return index[name].iloc[:0]
+    start, stop = by_client.loc[client_key, [f"{name}_start", f"{name}_stop"]]
+    return index[name].iloc[start:stop]
+
+
+def client_totals(index):
+    """
+    Lifetime totals per client: id, display name, invoices, paid, debit and max_debit.
+
+    Returns:
+        pd.DataFrame: one row per client key
+    """
+    return index["by_client"][["id", "client", "invoices", "paid", "debit", "max_debit"]].reset_index()
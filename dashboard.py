@@ -7,6 +7,10 @@ import io
 from datetime import datetime, date
 import arabic_reshaper
 from bidi.algorithm import get_display
+from Constants import DATABASE_DIR
+from storage import get_storage
+from client_index import load_client_index, client_totals as index_client_totals
+from rollups import read_rollup
 
 #TODO:some things should be data dynamic while others won't 
 
@@ -43,7 +47,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 CLEAN_DATA_ROOT = os.path.join(os.getcwd(), "data", "clean")
-DATABASE_DIR = os.path.join(os.getcwd(), "database")
+storage = get_storage()
 
 # ==========================================
 # 2. HELPER FUNCTIONS
@@ -74,53 +78,56 @@ def create_zip_export(latest_dir):
     if not latest_dir: return None
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for filename in ["revenue.csv", "clients.csv", "services.csv", "pets.csv", "expenses.csv"]:
-            file_path = os.path.join(DATABASE_DIR, filename)
-            if os.path.exists(file_path):
-                zip_file.write(file_path, filename)
+        for name in ["revenue", "clients", "services", "pets", "expenses"]:
+            if storage.exists(name):
+                csv_buffer = io.StringIO()
+                storage.export_csv(name, csv_buffer)
+                zip_file.writestr(f"{name}.csv", csv_buffer.getvalue())
     zip_buffer.seek(0)
     return zip_buffer.getvalue()
 
 @st.cache_data
 def load_data():
     data = {}
-    files = {
-        "revenue": "revenue.csv",
-        "clients": "clients.csv",
-        "services": "services.csv",
-        "pets": "pets.csv",
-        "expenses": "expenses.csv" # Added Expenses
-    }
+    # clients, pets, revenue and services are summarized by the daily rollups, see load_rollup()
+    tables = ["expenses"] # Added Expenses
     
     latest_dir = DATABASE_DIR
     
     if latest_dir is None:
         st.error("⚠️ No data found. Run pipeline first.")
-        for key in files: data[key] = pd.DataFrame()
+        for key in tables: data[key] = pd.DataFrame()
         return data, None
         
-    for key, filename in files.items():
-        path = os.path.join(latest_dir, filename)
-        if os.path.exists(path):
-            data[key] = pd.read_csv(path)
-            if "creation_date" in data[key].columns:
-                data[key]["creation_date"] = pd.to_datetime(data[key]["creation_date"], format='mixed')
-            # Assuming expenses has a date column too
-            elif key == "expenses" and "date" in data[key].columns:
-                 data[key]["date"] = pd.to_datetime(data[key]["date"], format='mixed')
+    for key in tables:
+        if storage.exists(key):
+            # Dates come back as datetimes (stored natively, or parsed by the CSV backend)
+            data[key] = storage.read(key)
         else:
             data[key] = pd.DataFrame()
             
     return data, latest_dir
 
+@st.cache_data
+def load_rollup(name, from_date=None, to_date=None):
+    """Daily rollup rows of a date range (see rollups.py), kept up to date by process_data; never written here."""
+    return read_rollup(storage, name, from_date, to_date)
+
+@st.cache_data
+def load_client_totals():
+    """Lifetime totals per client from the client join index kept by process_data (no revenue group-by)."""
+    if not storage.exists("revenue"): return pd.DataFrame()
+    return index_client_totals(load_client_index(storage, save=False))
+
+@st.cache_data
+def load_date_bounds(name):
+    if not storage.exists(name): return None, None
+    return storage.date_bounds(name)
+
 # ==========================================
 # 3. LOAD DATA
 # ==========================================
 dfs, latest_dir = load_data()
-revenue_df = dfs["revenue"]
-clients_df = dfs["clients"]
-services_df = dfs["services"]
-pets_df = dfs["pets"]
 expenses_df = dfs["expenses"]
 
 # --- SIDEBAR ---
@@ -148,9 +155,10 @@ st.sidebar.markdown("---")
 min_date = date(2020, 1, 1)
 max_date = date.today()
 
-if not revenue_df.empty:
-    min_date = revenue_df['creation_date'].min().date()
-    max_date = revenue_df['creation_date'].max().date()
+first_date, last_date = load_date_bounds("revenue")
+if first_date is not None and not pd.isna(first_date):
+    min_date = first_date.date()
+    max_date = last_date.date()
 
 st.sidebar.header("📅 Date Filter")
 from_date = st.sidebar.date_input("From", min_date, min_value=min_date, max_value=max_date)
@@ -162,10 +170,9 @@ def filter_df(df, date_col='creation_date'):
     mask = (df[date_col].dt.date >= from_date) & (df[date_col].dt.date <= to_date)
     return df.loc[mask]
 
-rev_filtered = filter_df(revenue_df)
-clients_filtered = filter_df(clients_df)
-services_filtered = filter_df(services_df)
-pets_filtered = filter_df(pets_df)
+rev_daily = load_rollup("revenue_daily", from_date, to_date)
+clients_daily = load_rollup("clients_daily", from_date, to_date)
+services_daily = load_rollup("services_daily", from_date, to_date)
 # Handle Expenses Date Column (might be 'date' or 'creation_date')
 exp_date_col = 'date' if not expenses_df.empty and 'date' in expenses_df.columns else 'creation_date'
 expenses_filtered = filter_df(expenses_df, exp_date_col)
@@ -186,7 +193,7 @@ if page == "🏠 Overview":
     # KPIs
     kpi1, kpi2, kpi3, kpi4 = st.columns(4)
     
-    total_rev = rev_filtered['paid'].sum() if not rev_filtered.empty else 0
+    total_rev = rev_daily['paid'].sum() if not rev_daily.empty else 0
     total_exp = expenses_filtered['amount'].sum() if not expenses_filtered.empty else 0
     net_profit = total_rev - total_exp
     
@@ -194,16 +201,16 @@ if page == "🏠 Overview":
     kpi2.metric("💸 Total Expenses", f"{total_exp:,.0f} EGP")
     kpi3.metric("📈 Net Profit", f"{net_profit:,.0f} EGP", delta_color="normal")
     
-    new_clients = len(clients_filtered) if not clients_filtered.empty else 0
+    new_clients = int(clients_daily['new_clients'].sum()) if not clients_daily.empty else 0
     kpi4.metric("👥 New Clients", new_clients)
 
     st.markdown("---")
     
     # Revenue Trend
     st.subheader("Revenue Trend Over Time")
-    if not rev_filtered.empty:
+    if not rev_daily.empty:
         # Aggregate Revenue
-        daily_rev = rev_filtered.set_index('creation_date').resample('W')['paid'].sum().reset_index()
+        daily_rev = rev_daily.groupby('creation_date')['paid'].sum().resample('W').sum().reset_index()
         daily_rev.columns = ['date', 'amount']
         
         fig = px.line(daily_rev, x='date', y='amount', 
@@ -216,21 +223,24 @@ elif page == "💸 Financial Performance":
     st.title("💸 Financial Performance")
     kpi1,kpi2,kpi3=st.columns(3)
      #TODO: mean bill amount from sevuce or revenue?
-    kpi1.metric("Mean Bill Amount", f"{rev_filtered['paid'].mean():,.0f} EGP")
-    kpi2.metric("Mean Bill Cost", f"{services_filtered['cost'].mean():,.0f} EGP")
-    kpi3.metric("Number of Bills", f"{len(rev_filtered):,.0f}")
+    bills = rev_daily['invoices'].sum() if not rev_daily.empty else 0
+    costs = services_daily['costs'].sum() if not services_daily.empty else 0
+    kpi1.metric("Mean Bill Amount", f"{rev_daily['paid'].sum() / bills if bills else float('nan'):,.0f} EGP")
+    kpi2.metric("Mean Bill Cost", f"{services_daily['cost'].sum() / costs if costs else float('nan'):,.0f} EGP")
+    kpi3.metric("Number of Bills", f"{bills:,.0f}")
 elif page == "🩺 Operations":
     st.title("🩺 Operations")
-    if not services_filtered.empty:
+    if not services_daily.empty:
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Top Services (By Volume)")
-            top_vol = services_filtered.groupby('service')['quantity'].sum().sort_values(ascending=False).head(10).reset_index()
+            service_totals = services_daily.groupby('service', observed=True, as_index=False)[['quantity', 'sale_price']].sum()
+            top_vol = service_totals.sort_values('quantity', ascending=False).head(10)[['service', 'quantity']]
             fig_vol = px.bar(top_vol, x='quantity', y='service', orientation='h', color_continuous_scale='Greens')
             st.plotly_chart(fig_vol, use_container_width=True)
         with col2:
             st.subheader("Top Services (By Value)")
-            top_val = services_filtered.groupby('service')['sale_price'].sum().sort_values(ascending=False).head(10).reset_index()
+            top_val = service_totals.sort_values('sale_price', ascending=False).head(10)[['service', 'sale_price']]
             top_val['sales'] = top_val['sale_price']
             fig_val = px.bar(top_val, x='sales', y='service', orientation='h', color_continuous_scale='Greens')
             st.plotly_chart(fig_val, use_container_width=True)
@@ -238,9 +248,8 @@ elif page == "🩺 Operations":
         col3,col4=st.columns(2)
         with col3:
             st.subheader("Doctors' Performance ")
-            docs=services_df["doctor"].value_counts()
-            docs=docs.reset_index()
-            docs.columns=["doctor","Number of Appointments"]
+            docs = load_rollup("services_daily").groupby('doctor', observed=True, as_index=False).agg(**{"Number of Appointments": ("rows", "sum")})
+            docs = docs.sort_values("Number of Appointments", ascending=False)
             fig_docs = px.bar(docs, x='Number of Appointments', y='doctor', orientation='v', color_continuous_scale='Greens')
             st.plotly_chart(fig_docs, use_container_width=True)
         with col4:
@@ -251,18 +260,22 @@ elif page == "🩺 Operations":
 
 elif page == "👥 Clients":
     st.title("👥 Client Insights")
+    # All-time totals per client (debit, paid), precomputed in the client join index
+    client_totals = load_client_totals()
     
     # KPIs
     kpi1, kpi2, kpi3 = st.columns(3)
     
-    total_clients = len(clients_df) if not clients_df.empty else 0
-    clients_with_debt = revenue_df[revenue_df['debit'] > 0]['client'].nunique() if not revenue_df.empty else 0
-    active_clients = clients_filtered[clients_filtered['status']=='Active'].count()[0]
+    all_clients_daily = load_rollup("clients_daily")
+    total_clients = int(all_clients_daily['new_clients'].sum()) if not all_clients_daily.empty else 0
+    clients_with_debt = int((client_totals['max_debit'] > 0).sum()) if not client_totals.empty else 0
+    active_clients = int(clients_daily.loc[clients_daily['status']=='Active', 'new_clients'].sum()) if not clients_daily.empty else 0
     
     # Group by date to see client growth over time
-    if not clients_filtered.empty:
-        three_months_ago = clients_df['creation_date'].max() - pd.DateOffset(months=3)
-        clients_growth = clients_df[clients_df['creation_date'] >= three_months_ago].groupby('creation_date').size().reset_index(name='New Clients')
+    if not clients_daily.empty:
+        three_months_ago = all_clients_daily['creation_date'].max() - pd.DateOffset(months=3)
+        recent_clients = all_clients_daily[all_clients_daily['creation_date'] >= three_months_ago]
+        clients_growth = recent_clients.groupby('creation_date')['new_clients'].sum().reset_index(name='New Clients')
     kpi1.metric("Total Clients", total_clients)
     kpi2.metric("New Clients", active_clients)
     kpi3.metric("Clients with Debt", clients_with_debt)
@@ -281,10 +294,9 @@ elif page == "👥 Clients":
     
     with col1:
         st.subheader("Highest Debitors")
-        if not revenue_df.empty:
-            top_debitors = revenue_df.groupby('client')['debit'].sum()
-            top_debitors=top_debitors[top_debitors>0].sort_values(ascending=False).head(10)
-            top_debitors=top_debitors.reset_index()
+        if not client_totals.empty:
+            top_debitors = client_totals[client_totals['debit'] > 0]
+            top_debitors = top_debitors.sort_values('debit', ascending=False).head(10)[['client', 'debit']]
             fig_debitors = px.bar(
                 top_debitors, 
                 x='client', 
@@ -299,8 +311,8 @@ elif page == "👥 Clients":
     
     with col2:
         st.subheader("Highest Payees")
-        if not revenue_df.empty:
-            top_payees = revenue_df.groupby('client')['paid'].sum().sort_values(ascending=False).head(10).reset_index()
+        if not client_totals.empty:
+            top_payees = client_totals.sort_values('paid', ascending=False).head(10)[['client', 'paid']]
             fig_payees = px.bar(
                 top_payees, 
                 x='client', 
@@ -0,0 +1,179 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from Constants import (
+    HEADERS, MAX_CONCURRENT_FETCHES, MAX_RETRIES, RETRY_BACKOFF_BASE, RETRY_MAX_DELAY,
+    RETRY_STATUS_CODES, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST
+)
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# SHARED HTTP SESSION
+# ==========================================
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def _mount_pool(session, pool_size):
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def create_session(pool_size=MAX_CONCURRENT_FETCHES):
+    """
+    Create a requests session with keep-alive and a connection pool.
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host.
+            Should be at least the number of concurrent fetch workers.
+
+    Returns:
+        requests.Session: Session with the default API headers preset
+    """
+    session = requests.Session()
+    _mount_pool(session, pool_size)
+
+    # Content-Type is set per request (json= on POST); GET exports don't send a body
+    session.headers.update({k: v for k, v in HEADERS.items() if k != "Content-Type"})
+    return session
+
+
+def get_session(pool_size=None):
+    """
+    Return the process-wide session, creating it on first use.
+
+    Args:
+        pool_size (int): Connections the caller's workers need at once. A
+            session created with a smaller pool gets a larger one, so extra
+            workers (e.g. backfill --workers) keep their connections alive.
+
+    Returns:
+        requests.Session: Shared session reused by sign-in and all export calls
+    """
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None:
+            _session_pool_size = max(1, pool_size or MAX_CONCURRENT_FETCHES)
+            _session = create_session(_session_pool_size)
+        elif pool_size and pool_size > _session_pool_size:
+            _session_pool_size = pool_size
+            _mount_pool(_session, pool_size)
+    return _session
+
+
+def close_session():
+    """Close the shared session and release its pooled connections."""
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            _session_pool_size = 0
+
+
+# ==========================================
+# RATE LIMITING & RETRIES
+# ==========================================
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+rate_limiter = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header (seconds or HTTP date) in seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (0-based).
+
+    The server's Retry-After wins when present; otherwise exponential
+    backoff with full jitter. Both are capped at RETRY_MAX_DELAY.
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+def request_with_retry(session, method, url, max_retries=MAX_RETRIES, **kwargs):
+    """
+    Send a request through the rate limiter, retrying throttled and failed calls.
+
+    Connection errors, timeouts and RETRY_STATUS_CODES responses are retried up
+    to max_retries times. The last response is returned as-is (even if it is
+    still an error), and the last connection error is re-raised.
+
+    Args:
+        session (requests.Session): Session to send the request with
+        method (str): HTTP method
+        url (str): Request URL
+        max_retries (int): Retries after the first attempt
+        **kwargs: Passed to session.request()
+
+    Returns:
+        requests.Response
+    """
+    for attempt in range(max_retries + 1):
+        rate_limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Connection error on {url}: {e}. Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+            return response
+
+        delay = backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+        logger.warning(f"Got {response.status_code} from {url}. Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+        response.close()
+        time.sleep(delay)
@@ -1,11 +1,16 @@
-import requests
 import json
-import pandas as pd
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os 
 import logging
-from Constants import BASE_URL, HEADERS, ENDPOINTS ,DATASETS_DIR
+import argparse
+import tempfile
+import threading
+from Constants import ENDPOINTS ,DATASETS_DIR, MAX_CONCURRENT_FETCHES, WATERMARKS_FILE, DEFAULT_LOOKBACK_DAYS, DOWNLOAD_CHUNK_SIZE
+from http_client import get_session, close_session, request_with_retry
+from token_cache import get_cached_token, store_token, invalidate_token
+from raw_store import payload_sha256, find_payload, record_payload, is_processed
 
 # ==========================================
 # CONFIGURATION
@@ -19,6 +24,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+_watermarks_lock = threading.Lock()
+_auth_lock = threading.Lock()
+
 # Use relative path for portability
 
 def sign_in():
@@ -33,7 +41,7 @@ def sign_in():
     }
 
     try:
-        response = requests.post(url, json=payload, headers=HEADERS)
+        response = request_with_retry(get_session(), "POST", url, json=payload)
         if response.status_code == 200:
             logger.info("Login Successful!")
             return response.json()
@@ -45,9 +53,42 @@ def sign_in():
         logger.error(f"Connection Error: {e}")
         return None
 
-def fetch_data(token, endpoint_key, dynamic_params={}):
+def stream_to_file(response, target_dir, endpoint_key):
+    """
+    Stream a response body in chunks to a temp file inside target_dir.
+    
+    The first chunk is sniffed for the PK (xlsx/zip) signature. JSON bodies
+    are small, so they are read into memory and parsed instead of written.
+    
+    Returns:
+        dict: {"type": "file", "path": temp_path} or {"type": "json", "data": ...}
+    """
+    content_type = response.headers.get("Content-Type", "")
+    chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+    first_chunk = next(chunks, b"")
+    
+    # Check for Excel/Zip signature (PK) or JSON, fallback to file if unknown
+    if not first_chunk.startswith(b'PK') and "json" in content_type:
+        return {"type": "json", "data": json.loads(first_chunk + b"".join(chunks))}
+    
+    os.makedirs(target_dir, exist_ok=True)
+    tmp_file = tempfile.NamedTemporaryFile(dir=target_dir, prefix=f".{endpoint_key}.", suffix=".part", delete=False)
+    try:
+        with tmp_file:
+            tmp_file.write(first_chunk)
+            for chunk in chunks:
+                tmp_file.write(chunk)
+    except Exception:
+        os.remove(tmp_file.name)
+        raise
+    return {"type": "file", "path": tmp_file.name}
+
+def fetch_data(token, endpoint_key, dynamic_params={}, target_dir=None):
     """
     Generic fetch function using requests params dictionary.
+    
+    If target_dir is given, the report is streamed straight to a temp file
+    there instead of being held in memory; save_data() renames it into place.
     """
     # 1. Validation
     if endpoint_key not in ENDPOINTS:
@@ -65,61 +106,129 @@ def fetch_data(token, endpoint_key, dynamic_params={}):
     logger.info(f"--- Fetching: {endpoint_key} ---")
     logger.info(f"--- Params: {params} ---")
     
-    # 3. Auth Headers
-    auth_headers = HEADERS.copy()
-    auth_headers["Authorization"] = f"Bearer {token}"
-    auth_headers.pop("Content-Type", None) # Remove Content-Type for GET requests
+    # 3. Auth Headers (per request, so a token refreshed by another worker is not overwritten)
+    session = get_session()
+    auth_headers = {"Authorization": f"Bearer {token}"}
     
     try:
         # 4. Request (requests handles the ?key=value logic automatically)
-        response = requests.get(url, headers=auth_headers, params=params)
+        response = request_with_retry(session, "GET", url, params=params, headers=auth_headers, stream=target_dir is not None)
         
-        if response.status_code == 200:
-            logger.info(f"{endpoint_key} fetched successfully!")
-            
-            content_type = response.headers.get("Content-Type", "")
-            
-            # Check for Excel/Zip signature (PK) or JSON
-            if response.content.startswith(b'PK'):
-                return {"type": "file", "content": response.content}
-            elif "json" in content_type:
-                return {"type": "json", "data": response.json()}
+        # Token expired or revoked: sign in again once and repeat the request
+        if response.status_code == 401:
+            response.close()
+            logger.warning(f"{endpoint_key}: token rejected, signing in again")
+            token = authenticate(stale_token=token)
+            if not token:
+                return None
+            auth_headers["Authorization"] = f"Bearer {token}"
+            response = request_with_retry(session, "GET", url, params=params, headers=auth_headers, stream=target_dir is not None)
+        
+        with response:
+        
+            if response.status_code == 200:
+                logger.info(f"{endpoint_key} fetched successfully!")
+                
+                if target_dir is not None:
+                    return stream_to_file(response, target_dir, endpoint_key)
+                
+                content_type = response.headers.get("Content-Type", "")
+                
+                # Check for Excel/Zip signature (PK) or JSON
+                if response.content.startswith(b'PK'):
+                    return {"type": "file", "content": response.content}
+                elif "json" in content_type:
+                    return {"type": "json", "data": response.json()}
+                else:
+                    # Fallback to file if unknown
+                    return {"type": "file", "content": response.content}
             else:
-                # Fallback to file if unknown
-                return {"type": "file", "content": response.content}
-        else:
-            logger.error(f"Failed to fetch {endpoint_key}. Code: {response.status_code}")
-            logger.error(f"Error: {response.text}")
-            return None
+                logger.error(f"Failed to fetch {endpoint_key}. Code: {response.status_code}")
+                logger.error(f"Error: {response.text}")
+                return None
 
     except Exception as e:
         logger.error(f"Connection Error: {e}")
         return None
 
-def save_data(data_package, filename_base):
+def raw_data_dir(run_date=None):
+    """Return data/raw/YYYY/MM/DD for run_date (defaults to today)."""
+    now = run_date or datetime.now()
+    return os.path.join(DATASETS_DIR, "raw", now.strftime("%Y"), now.strftime("%m"), now.strftime("%d"))
+
+def place_payload(tmp_path, filepath, filename_base, overwrite=True):
+    """
+    Move a completed download into place and register it in the raw manifest.
+    
+    Args:
+        tmp_path (str): Temp file holding the download
+        filepath (str): Final path in the raw day directory
+        filename_base (str): Dataset name
+        overwrite (bool): Replace a different payload already saved at filepath,
+            once process_data has merged it (an unmerged snapshot is never replaced)
+        
+    Returns:
+        str or None: Path the payload is stored at, None if it was refused
+    """
+    try:
+        # Skip payloads that were already merged (content-addressed). One that was
+        # only ingested is saved again here, so the next process run picks it up
+        digest = payload_sha256(tmp_path)
+        if is_processed(digest):
+            existing = find_payload(digest)
+            logger.info(f"⏭️ {filename_base} unchanged, already merged from: {existing}")
+            return existing
+        
+        if os.path.exists(filepath) and payload_sha256(filepath) == digest:
+            logger.info(f"⏭️ {filename_base} unchanged, already stored at: {filepath}")
+            return filepath
+        
+        # Another snapshot of this day is already saved: keep it and its manifest entry
+        if os.path.exists(filepath):
+            if not overwrite:
+                logger.warning(f"⚠️ {filepath} already holds another {filename_base} snapshot, not overwriting it")
+                return None
+            # A same-day rerun fetches a narrower window (the watermark has moved on):
+            # replacing a snapshot that wasn't merged yet would lose its older rows
+            if not is_processed(payload_sha256(filepath)):
+                logger.warning(f"⚠️ {filepath} holds a {filename_base} snapshot that isn't merged yet, "
+                               f"keeping it (run process_data.py)")
+                return None
+        
+        os.replace(tmp_path, filepath)
+        record_payload(digest, filename_base, filepath)
+        logger.info(f"💾 Data saved to: {filepath}")
+        return filepath
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_data(data_package, filename_base, run_date=None, overwrite=True):
     """
     Intelligently saves data based on type (File vs JSON).
+    
+    The file goes to data/raw/YYYY/MM/DD of run_date (defaults to today).
+    With overwrite=False, or while the existing file of that day isn't merged
+    yet, that file is left untouched and None is returned.
     """
     if not data_package:
         return None
 
     try:
         # Create directory structure: data/raw/YYYY/MM/DD
-        now = datetime.now()
-        year = now.strftime("%Y")
-        month = now.strftime("%m")
-        day = now.strftime("%d")
-
-        target_dir = os.path.join(DATASETS_DIR, "raw", year, month, day)
+        target_dir = raw_data_dir(run_date)
         os.makedirs(target_dir, exist_ok=True)
         
         # CASE 1: BINARY FILE (Excel)
         if data_package.get("type") == "file":
             filepath = os.path.join(target_dir, f"{filename_base}.xlsx")
-            with open(filepath, "wb") as f:
-                f.write(data_package["content"])
-            logger.info(f"💾 Data saved to: {filepath}")
-            return filepath
+            tmp_path = data_package.get("path")
+            if tmp_path is None:
+                tmp_path = filepath + ".part"
+                with open(tmp_path, "wb") as f:
+                    f.write(data_package["content"])
+            
+            return place_payload(tmp_path, filepath, filename_base, overwrite)
             
         # CASE 2: JSON DATA
         elif data_package.get("type") == "json":
@@ -134,64 +243,290 @@ def save_data(data_package, filename_base):
                         break
                 if not records: records = [data]
 
-            df = pd.DataFrame(records)
-            filepath = os.path.join(target_dir, f"{filename_base}.xlsx")
-            df.to_excel(filepath, index=False)
-            logger.info(f"JSON converted and saved to: {filepath}")
-            return filepath
+            # Line-delimited JSON: no Excel round trip, read back with pd.read_json(lines=True)
+            filepath = os.path.join(target_dir, f"{filename_base}.jsonl")
+            tmp_path = filepath + ".part"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            return place_payload(tmp_path, filepath, filename_base, overwrite)
 
     except Exception as e:
         logger.error(f"Error saving data: {e}")
         return None
 
-def ingest_data():
-    load_dotenv()
+def fetch_and_save(token, endpoint_key, dynamic_params={}, run_date=None, overwrite=True):
+    """
+    Fetch a single endpoint and save the result under its own name.
+    """
+    data_package = fetch_data(token, endpoint_key, dynamic_params, target_dir=raw_data_dir(run_date))
+    return save_data(data_package, endpoint_key, run_date, overwrite)
+
+def load_watermarks():
+    """
+    Load the per-endpoint high-water marks.
     
-    auth_data = sign_in()
+    Returns:
+        dict: endpoint key -> ISO timestamp of the end of the last successful fetch
+    """
+    if not os.path.exists(WATERMARKS_FILE):
+        return {}
+    try:
+        with open(WATERMARKS_FILE, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading watermarks, falling back to default window: {e}")
+        return {}
+
+def save_watermark(endpoint_key, fetched_to):
+    """
+    Persist the high-water mark of one endpoint (thread-safe, atomic replace).
     
-    if auth_data and auth_data.get("success"):
-        # Robust token extraction
-        token = auth_data.get("data", {}).get("token")
-        
-        if token:
-            logger.info("="*50)
-            
-            # Dynamic Dates (Last 7 Days)
-            today = datetime.now()
-            thirty_days_ago = today - timedelta(days=7)
-            date_to_str = today.strftime("%Y-%m-%d")
-            date_from_str = thirty_days_ago.strftime("%Y-%m-%d")
+    Args:
+        endpoint_key (str): Key in Constants.ENDPOINTS
+        fetched_to (datetime): End of the window that was fetched and saved
+    """
+    with _watermarks_lock:
+        watermarks = load_watermarks()
+        watermarks[endpoint_key] = fetched_to.isoformat(timespec="seconds")
+        os.makedirs(os.path.dirname(WATERMARKS_FILE), exist_ok=True)
+        tmp_path = WATERMARKS_FILE + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(watermarks, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, WATERMARKS_FILE)
+
+def incremental_params(endpoint_key, watermarks, now):
+    """
+    Build the CreatedAt window (last_successful_to, now] for one endpoint.
+    
+    The export API filters on whole days, so the window starts on the day of
+    the watermark itself; the rows of that day fetched last time are dropped
+    again by merge_and_save(). Endpoints without a watermark fall back to the
+    last DEFAULT_LOOKBACK_DAYS days.
+    """
+    last_to = watermarks.get(endpoint_key)
+    if last_to:
+        date_from = datetime.fromisoformat(last_to)
+        if (now - date_from).days > DEFAULT_LOOKBACK_DAYS:
+            logger.warning(f"⚠️ {endpoint_key}: last successful fetch was {last_to}, catching up the gap")
+    else:
+        date_from = now - timedelta(days=DEFAULT_LOOKBACK_DAYS)
+    
+    return {
+        "CreatedAtFrom": date_from.strftime("%Y-%m-%d"),
+        "CreatedAtTo": now.strftime("%Y-%m-%d")
+    }
+
+def fetch_all(token, dynamic_params={}, max_workers=MAX_CONCURRENT_FETCHES, params_by_endpoint=None, fetched_to=None):
+    """
+    Fetch and save every export endpoint in Constants.ENDPOINTS concurrently.
+    
+    Args:
+        token (str): Bearer token from sign_in()
+        dynamic_params (dict): Params applied to every endpoint (e.g. date range)
+        max_workers (int): Maximum number of reports downloaded in parallel.
+            Use 1 to fetch the endpoints one after another.
+        params_by_endpoint (dict): Optional endpoint key -> params, applied on
+            top of dynamic_params (e.g. per-endpoint incremental windows)
+        fetched_to (datetime): If given, the watermark of each endpoint that
+            was saved successfully is moved to this time
             
-            # Common params to override defaults
-            common_params = {
-                "CreatedAtFrom": date_from_str,
-                "CreatedAtTo": date_to_str
+    Returns:
+        dict: endpoint key -> saved filepath (None if the fetch or save failed)
+    """
+    endpoint_keys = [key for key in ENDPOINTS if key != "signin"]
+    params_by_endpoint = params_by_endpoint or {}
+    results = {}
+    
+    # One pooled connection per worker thread
+    get_session(pool_size=max(1, max_workers))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {}
+        for key in endpoint_keys:
+            params = {**dynamic_params, **params_by_endpoint.get(key, {})}
+            futures[executor.submit(fetch_and_save, token, key, params)] = key
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+                if results[key] and fetched_to is not None:
+                    save_watermark(key, fetched_to)
+            except Exception as e:
+                logger.error(f"Error ingesting {key}: {e}")
+                results[key] = None
+    
+    failed = [key for key in endpoint_keys if not results.get(key)]
+    if failed:
+        logger.warning(f"⚠️ Endpoints not saved: {', '.join(failed)}")
+    return results
+
+def split_date_range(date_from, date_to, window="week"):
+    """
+    Split an inclusive date range into consecutive, non-overlapping windows.
+    
+    Args:
+        date_from (date): First day of the range
+        date_to (date): Last day of the range
+        window (str): "day", "week" (7 days) or "month" (calendar months)
+        
+    Returns:
+        list[tuple[date, date]]: Inclusive (start, end) of each window
+    """
+    if window not in ("day", "week", "month"):
+        raise ValueError(f"Unknown backfill window '{window}'. Use day, week or month.")
+    
+    windows = []
+    start = date_from
+    while start <= date_to:
+        if window == "day":
+            end = start
+        elif window == "week":
+            end = start + timedelta(days=6)
+        else:
+            next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+            end = next_month - timedelta(days=1)
+        end = min(end, date_to)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+def backfill(token, date_from, date_to, window="week", max_workers=MAX_CONCURRENT_FETCHES, endpoint_keys=None):
+    """
+    Fetch history for an arbitrary date range, one request per window and endpoint.
+    
+    Each window is saved in data/raw/YYYY/MM/DD of its last day, so the
+    backfilled days look exactly like regular weekly runs to process_data.
+    A snapshot already saved for that day is never overwritten; the window
+    is reported as not saved instead.
+    
+    Args:
+        token (str): Bearer token from sign_in()
+        date_from (date): First day to fetch
+        date_to (date): Last day to fetch
+        window (str): "day", "week" or "month"
+        max_workers (int): Maximum number of requests in flight at once
+        endpoint_keys (list): Endpoints to backfill (defaults to all exports)
+        
+    Returns:
+        dict: (endpoint key, window start, window end) -> saved filepath or None
+    """
+    if endpoint_keys is None:
+        endpoint_keys = [key for key in ENDPOINTS if key != "signin"]
+    windows = split_date_range(date_from, date_to, window)
+    logger.info(f"Backfilling {len(endpoint_keys)} endpoints over {len(windows)} {window} windows")
+    
+    results = {}
+    # One pooled connection per worker thread
+    get_session(pool_size=max(1, max_workers))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {}
+        for start, end in windows:
+            params = {
+                "CreatedAtFrom": start.strftime("%Y-%m-%d"),
+                "CreatedAtTo": end.strftime("%Y-%m-%d")
             }
-            
-            # 1. Clients
-            clients = fetch_data(token, "clients", common_params)
-            save_data(clients, "clients")
+            for key in endpoint_keys:
+                future = executor.submit(fetch_and_save, token, key, params, end, overwrite=False)
+                futures[future] = (key, start, end)
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                results[task] = future.result()
+            except Exception as e:
+                logger.error(f"Error backfilling {task[0]} {task[1]}..{task[2]}: {e}")
+                results[task] = None
+    
+    failed = [task for task, path in results.items() if not path]
+    logger.info(f"Backfill finished: {len(results) - len(failed)}/{len(results)} reports saved")
+    for key, start, end in sorted(failed):
+        logger.warning(f"⚠️ Not saved: {key} {start}..{end}")
+    return results
 
-            # 2. Services
-            services = fetch_data(token, "services", common_params)
-            save_data(services, "services")
-            
-            # 3. Pets
-            pets = fetch_data(token, "pets", common_params)
-            save_data(pets, "pets")
-            
-            # 4. Revenue
-            revenue = fetch_data(token, "revenue", common_params)
-            save_data(revenue, "revenue")
+def token_cache_key():
+    """Cache key of the account configured in the environment."""
+    return f"{os.getenv('CLINIC_CODE')}:{os.getenv('EMAIL_OR_USERNAME')}"
 
-            # 5. Expenses
-            expenses = fetch_data(token, "expenses", common_params)
-            save_data(expenses, "expenses")
+def authenticate(stale_token=None):
+    """
+    Return a valid bearer token, signing in only when no cached token is usable.
+    
+    Sign-in is serialized, so concurrent workers share a single login.
+    
+    Args:
+        stale_token (str): Token the API just rejected; it is dropped from the
+            cache before looking for a usable one
             
-        else:
-            logger.error("Token not found in login response.")
-    else:
+    Returns:
+        str or None: Bearer token, or None if login failed
+    """
+    key = token_cache_key()
+    with _auth_lock:
+        if stale_token:
+            invalidate_token(key, stale_token)
+        
+        token = get_cached_token(key)
+        if token:
+            logger.info("Reusing cached auth token.")
+            return token
+        
+        auth_data = sign_in()
+        
+        if auth_data and auth_data.get("success"):
+            # Robust token extraction
+            token = auth_data.get("data", {}).get("token")
+            if token:
+                store_token(key, token)
+            else:
+                logger.error("Token not found in login response.")
+            return token
         logger.error("Login failed.")
+        return None
+
+def ingest_data():
+    load_dotenv()
+    
+    token = authenticate()
+    
+    if token:
+        logger.info("="*50)
+        
+        # Incremental window per endpoint: (last successful fetch, now]
+        now = datetime.now()
+        watermarks = load_watermarks()
+        params_by_endpoint = {
+            key: incremental_params(key, watermarks, now)
+            for key in ENDPOINTS if key != "signin"
+        }
+        
+        # Clients, services, pets, revenue and expenses in parallel
+        fetch_all(token, params_by_endpoint=params_by_endpoint, fetched_to=now)
+    
+    close_session()
+
+def run_backfill(date_from, date_to, window="week", max_workers=MAX_CONCURRENT_FETCHES):
+    """Sign in and backfill every export endpoint between two dates."""
+    load_dotenv()
+    
+    token = authenticate()
+    
+    if token:
+        logger.info("="*50)
+        backfill(token, date_from, date_to, window, max_workers)
+    
+    close_session()
 
 if __name__ == "__main__":
-    ingest_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch export reports from the clinic API.")
+    parser.add_argument("--backfill", nargs=2, metavar=("FROM", "TO"),
+                        help="Backfill history between two dates (YYYY-MM-DD) instead of an incremental run")
+    parser.add_argument("--window", choices=["day", "week", "month"], default="week",
+                        help="Backfill window size (default: week)")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_FETCHES,
+                        help="Maximum number of concurrent requests")
+    args = parser.parse_args()
+    
+    if args.backfill:
+        date_from, date_to = (datetime.strptime(d, "%Y-%m-%d").date() for d in args.backfill)
+        run_backfill(date_from, date_to, args.window, args.workers)
+    else:
+        ingest_data()
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+from Constants import KEY_INDEX_DIR
+from storage import TIMESTAMP_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# PERSISTED KEY INDEX FOR THE MASTER TABLES
+# ==========================================
+# For each keyed dataset, data/state/key_index/<name>.json maps every record
+# key (client id, pet code, invoice code) to a fingerprint of the row stored
+# in the master table. The weekly merge looks keys up here instead of
+# re-reading the whole table.
+
+DATE_COLUMNS = {"creation_date"}
+
+# Bump when row_hashes() changes: fingerprints and services row_hash values
+# of an older format no longer match freshly hashed rows and are recomputed
+HASH_FORMAT = 2
+
+
+def normalize_column(series, column):
+    """
+    Render a column as comparable text, whatever dtype it was read with.
+
+    A cleaned frame and the same rows read back from CSV differ in dtypes
+    (2578 vs 2578.0, str vs int phones, Timestamp vs text dates). Dates are
+    rendered with TIMESTAMP_FORMAT, numbers without a trailing ".0", other
+    values as stripped text and missing values as "".
+    """
+    if column in DATE_COLUMNS or is_datetime64_any_dtype(series):
+        dates = pd.to_datetime(series, format="mixed", errors="coerce")
+        return dates.dt.strftime(TIMESTAMP_FORMAT).fillna("")
+
+    numbers = pd.to_numeric(series, errors="coerce")
+    text = series.astype(str).str.strip()
+    text = text.where(numbers.isna(), numbers.astype(str).str.replace(r"\.0$", "", regex=True))
+    return text.where(series.notna(), "")
+
+
+def key_values(df, key_columns):
+    """Return the normalized record key of every row as a string Series."""
+    keys = normalize_column(df[key_columns[0]], key_columns[0])
+    for column in key_columns[1:]:
+        keys = keys + "\x1f" + normalize_column(df[column], column)
+    return keys
+
+
+def row_hashes(df, columns=None):
+    """
+    Return a stable 64-bit hash of every row's normalized values, as int64.
+
+    Stable across runs and dtypes: the same record hashes the same whether it
+    comes from a fresh export or was read back from any storage backend.
+    Columns are hashed in sorted order, so a backend or cleaner that returns
+    them in another order doesn't change the hash.
+
+    Args:
+        df (pd.DataFrame): Rows to hash
+        columns (list): Columns to hash (defaults to all of df's)
+    """
+    columns = sorted(df.columns if columns is None else columns)
+    normalized = pd.DataFrame({column: normalize_column(df[column], column) for column in columns})
+    hashes = pd.util.hash_pandas_object(normalized, index=False)
+    return pd.Series(hashes.to_numpy().view("int64"), index=df.index)
+
+
+def row_fingerprints(df):
+    """Return a 64-bit hex fingerprint of every row's normalized values."""
+    return row_hashes(df).map(lambda value: f"{value & 0xFFFFFFFFFFFFFFFF:016x}")
+
+
+def _index_path(name):
+    return os.path.join(KEY_INDEX_DIR, f"{name}.json")
+
+
+def build_key_index(storage, name, key_columns):
+    """
+    Build the key -> fingerprint index of a table from its stored rows.
+
+    Returns:
+        dict: normalized key -> row fingerprint
+    """
+    df = storage.read(name)
+    # Keys are unique in the table; if not, the first row is the live one like in merge_and_save
+    df = df.drop_duplicates(subset=key_columns)
+    return dict(zip(key_values(df, key_columns), row_fingerprints(df)))
+
+
+def load_key_index(storage, name, key_columns):
+    """
+    Load a dataset's key index, rebuilding it from the table if it is stale.
+
+    The index records the storage version (backend, size and mtime) it was
+    built for; if the table was changed by anything else (a rebuild, a
+    manual edit, a restore, a backend switch), the versions no longer match
+    and the index is rebuilt with one full read.
+
+    Returns:
+        dict: normalized key -> row fingerprint
+    """
+    path = _index_path(name)
+    version = storage.version(name)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                index = json.load(f)
+            if (index.get("format") == HASH_FORMAT and index.get("version") == version
+                    and index.get("key_columns") == key_columns):
+                return index["rows"]
+            logger.info(f"🔄 Key index of {name} is out of date, rebuilding")
+        except Exception as e:
+            logger.warning(f"⚠️ Unreadable key index {path}, rebuilding: {e}")
+
+    rows = build_key_index(storage, name, key_columns)
+    save_key_index(storage, name, rows, key_columns)
+    return rows
+
+
+def save_key_index(storage, name, rows, key_columns):
+    """Persist a dataset's key index for the current version of its table."""
+    path = _index_path(name)
+    os.makedirs(KEY_INDEX_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"format": HASH_FORMAT, "version": storage.version(name), "key_columns": key_columns,
+                   "rows": rows}, f)
+    os.replace(tmp_path, path)
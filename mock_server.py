@@ -0,0 +1,212 @@
+import argparse
+import base64
+import io
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import openpyxl
+from Constants import ENDPOINTS
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+# Local stand-in for the export API: same paths as Constants.ENDPOINTS,
+# synthetic payloads in the vendor's report layout.
+API_PREFIX = urlparse(ENDPOINTS["signin"]["endpoint"]).path.rsplit("/", 1)[0]
+ROUTES = {urlparse(config["endpoint"]).path[len(API_PREFIX):]: key for key, config in ENDPOINTS.items()}
+
+NAMES = ["محمد", "احمد", "سارة", "منى", "يوسف", "هدى", "كريم", "ليلى", "عمر", "نور"]
+PET_NAMES = ["لي لي", "ايس", "خداش", "شوشو", "بيبو", "مولي", "زورو", "فلفل"]
+SERVICES = ["كشف - د. حساني", "اعطاء علاجات", "cbc mojo ", "تطعيم-Donia Essam", "خدمة محاليل", "حلاقة"]
+CATEGORIES = ["Clinic", "Labs mojo", "Grooming", "Boarding", "Reservation"]
+
+
+# ==========================================
+# SYNTHETIC REPORTS
+# ==========================================
+
+def _synthetic_rows(dataset, rows, start_date):
+    """Yield report rows (without the leading "No" column) for a dataset."""
+    rng = random.Random(dataset)
+    for i in range(rows):
+        day = start_date + timedelta(days=i % 7)
+        phone = str(1000000000 + rng.randrange(299999999))
+        if dataset == "clients":
+            yield [rng.choice(NAMES), 100000 + i, phone, day.strftime("%Y-%m-%d"), "Active"]
+        elif dataset == "pets":
+            yield [rng.choice(PET_NAMES), 100000 + i, day.strftime("%Y-%m-%d"), "Active",
+                   rng.choice(["Dog", "Cat"]), rng.choice(NAMES), phone]
+        elif dataset == "services":
+            yield [rng.choice(CATEGORIES), rng.choice(SERVICES), rng.randint(1, 3), rng.choice([0, 50, 200]),
+                   rng.choice([150, 300, 500]), "Donia Essam", day.strftime("%Y-%m-%d")]
+        elif dataset == "revenue":
+            amount = rng.choice([150, 300, 1000, 2300])
+            paid = amount - rng.choice([0, 0, 0, 50])
+            yield [day.strftime("%Y-%m-%d %H:%M:%S.0000000"), rng.choice(CATEGORIES), rng.choice(NAMES), phone,
+                   rng.choice(PET_NAMES), 100000 + i, amount, 0, amount, paid, amount - paid]
+        else:
+            yield [day.strftime("%Y-%m-%d"), rng.choice(["Rent", "Salaries", "Supplies"]), rng.randint(100, 5000)]
+
+
+REPORT_HEADERS = {
+    "clients": ["No", "Name", "Code", "Phone", "Date", "Status"],
+    "pets": ["#", "Pet Name", "Code", "Creation Date", "Statues", "Pet Species", "OwnerName", "OwnerPhone"],
+    "services": ["No", "Category", "Service", "Quantity", "Cost", "Sale Price", "Doctor", "Date"],
+    "revenue": ["No", "Date", "Type", "Client Name", "Client Phone", "Pet Name", "Invoice Code", "Amount",
+                "Discount", "Amount After Discount", "TotalPaided", "debit"],
+    "expenses": ["No", "Date", "Category", "Amount"]
+}
+
+
+def build_xlsx(dataset, rows, start_date):
+    """
+    Build an export workbook in the vendor layout (title, filters, header, rows, totals).
+
+    Returns:
+        bytes: xlsx file content
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    date_from = start_date.strftime("%Y-%m-%d")
+    date_to = (start_date + timedelta(days=6)).strftime("%Y-%m-%d")
+
+    sheet.append([f"{dataset.title()} Report"])
+    sheet.append([])
+    if dataset != "pets":
+        sheet.append(["CreatedAtFrom", date_from, "CreatedAtTo", date_to])
+        sheet.append([])
+    sheet.append(REPORT_HEADERS[dataset])
+    for i, row in enumerate(_synthetic_rows(dataset, rows, start_date), start=1):
+        sheet.append([i] + row)
+    if dataset in ("services", "revenue"):
+        sheet.append(["Total", None, None, None, 0])
+        sheet.append(["Total Paid", 0])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def build_json(dataset, rows, start_date):
+    """Build the same report as a JSON API response ({"data": [...]})."""
+    columns = REPORT_HEADERS[dataset][1:]
+    records = [dict(zip(columns, row)) for row in _synthetic_rows(dataset, rows, start_date)]
+    return json.dumps({"success": True, "data": records}, ensure_ascii=False).encode("utf-8")
+
+
+def mock_token(ttl=3600):
+    """Unsigned JWT-shaped token with an `exp` claim."""
+    claims = json.dumps({"sub": "mock", "exp": int(time.time()) + ttl}).encode()
+    return "mock." + base64.urlsafe_b64encode(claims).decode().rstrip("=") + ".signature"
+
+
+# ==========================================
+# SERVER
+# ==========================================
+
+def make_handler(rows=1000, latency=0.0, payload_format="xlsx"):
+    """
+    Create a request handler class serving /signin and the export endpoints.
+
+    Args:
+        rows (int): Rows per synthetic report (controls payload size)
+        latency (float): Seconds to wait before answering an export call,
+            standing in for report generation time on the backend
+        payload_format (str): "xlsx" or "json"
+    """
+    start_date = datetime(2026, 1, 1)
+    payloads = {}
+    payloads_lock = threading.Lock()
+
+    def get_payload(dataset):
+        # Build each report once, then serve it from memory
+        with payloads_lock:
+            if dataset not in payloads:
+                builder = build_json if payload_format == "json" else build_xlsx
+                payloads[dataset] = builder(dataset, rows, start_date)
+            return payloads[dataset]
+
+    class MockExportHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            path = urlparse(self.path).path
+            if not path.startswith(API_PREFIX):
+                return None
+            return ROUTES.get(path[len(API_PREFIX):])
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self._route() != "signin":
+                return self._send(404, b'{"success": false}')
+            body = {"success": True, "data": {"token": mock_token()}}
+            self._send(200, json.dumps(body).encode())
+
+        def do_GET(self):
+            dataset = self._route()
+            if dataset is None or dataset == "signin":
+                return self._send(404, b'{"success": false}')
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._send(401, b'{"success": false}')
+
+            time.sleep(latency)
+            if payload_format == "json":
+                self._send(200, get_payload(dataset))
+            else:
+                self._send(200, get_payload(dataset), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return MockExportHandler
+
+
+def start_server(port=0, rows=1000, latency=0.0, payload_format="xlsx"):
+    """
+    Start the mock server in a background thread.
+
+    Returns:
+        tuple: (server, base_url) - point API_BASE_URL at base_url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(rows, latency, payload_format))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}{API_PREFIX}"
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the clinic export API.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per synthetic report")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per export call")
+    parser.add_argument("--format", choices=["xlsx", "json"], default="xlsx")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.rows, args.latency, args.format)
+    logger.info(f"Mock export API listening on {base_url}")
+    logger.info(f"Run the pipeline against it with: API_BASE_URL={base_url} python ingest_data.py")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,47 @@
+import pandas as pd
+
+# ==========================================
+# PHONE NUMBER CANONICALIZATION
+# ==========================================
+# The exports carry phones as numbers, so Egyptian mobiles arrive without
+# their leading zero (1001234567 for 01001234567), and as text they may come
+# with a +20/0020 prefix or separators. canonical_phones() turns any of these
+# into one display string and one integer key, so clients.phone,
+# pets.client_phone and revenue.client_phone join on the same int64 values.
+
+# Egyptian mobile number without its leading 0: 10, 11, 12 or 15 + 8 digits
+EGYPT_MOBILE = r"1[0125]\d{8}"
+EGYPT_COUNTRY_CODE = "20"
+
+# Longest number that fits an int64 key exactly (E.164 allows 15 digits)
+MAX_KEY_DIGITS = 15
+
+
+def canonical_phones(phones):
+    """
+    Canonicalize phone numbers, vectorized.
+
+    Egyptian mobiles, in any of their forms (1001234567, 01001234567,
+    201001234567, +20 100 123 4567), are displayed as 01001234567 and keyed
+    as 201001234567, the E.164 digits. Other numbers keep their digits as
+    both display and key. Missing or digit-less values give NaN / <NA>.
+
+    Args:
+        phones (pd.Series): Phones as numbers, floats (1001234567.0) or text
+
+    Returns:
+        tuple: (display strings, Int64 keys) as Series aligned with phones
+    """
+    digits = (phones.astype("str")
+              .str.replace(r"\.0+$", "", regex=True)
+              .str.replace(r"\D", "", regex=True))
+    national = digits.str.replace(rf"^(?:00{EGYPT_COUNTRY_CODE}|{EGYPT_COUNTRY_CODE}|0)(?={EGYPT_MOBILE}$)", "", regex=True)
+    is_mobile = national.str.fullmatch(EGYPT_MOBILE)
+
+    display = national.where(~is_mobile, "0" + national)
+    display = display.where(phones.notna() & (digits != ""))
+
+    key_digits = national.where(~is_mobile, EGYPT_COUNTRY_CODE + national)
+    key_digits = key_digits.where(display.notna() & (key_digits.str.len() <= MAX_KEY_DIGITS))
+    keys = pd.to_numeric(key_digits, errors="coerce").astype("Int64")
+    return display, keys
@@ -1,8 +1,23 @@
 import pandas as pd
 import os
 import logging
+import argparse
+import zipfile
+import hashlib
+import inspect
+import json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from Constants import DATASETS_DIR
+from Constants import DATASETS_DIR, MAX_PROCESS_WORKERS, PARSE_CACHE_DIR, PARSE_CACHE_VERSION, MIGRATIONS_FILE
+from raw_store import payload_sha256, is_processed, mark_processed
+from key_index import HASH_FORMAT, key_values, row_hashes, row_fingerprints, load_key_index, save_key_index
+from schema import TABLE_SCHEMAS, apply_schema
+from service_rules import normalize_services, rules_version, load_matcher
+from phones import canonical_phones
+from client_index import load_client_index, build_client_index, save_client_index, update_client_index, stored_dates
+from rollups import ROLLUPS, update_rollups, build_rollup, build_rollups
+from storage import get_storage
+from xlsx_reader import read_vendor_xlsx
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,11 +27,45 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def assign_doctor(service):
-    service=service.split("-")
-    if len(service)<2 or service[1]=="":
-        return "NA"
-    return service[1]
+def raw_file_path(raw_data_dir, name):
+    """Return the raw file of a dataset: NDJSON (from JSON API responses) or Excel."""
+    jsonl_path = os.path.join(raw_data_dir, f"{name}.jsonl")
+    if os.path.exists(jsonl_path):
+        return jsonl_path
+    return os.path.join(raw_data_dir, f"{name}.xlsx")
+
+def read_raw(raw_data_dir, name, skiprows=None, header=0, usecols=None, skipfooter=0):
+    """
+    Read a raw dataset with the same column positions for both raw formats.
+    
+    Excel exports carry report title/filter rows, a leading "No" column and
+    total rows in the footer; they are parsed with the streaming reader in
+    xlsx_reader (read_excel is only the fallback). NDJSON files hold the plain records, in report
+    column order without the "No" column, so they skip the layout arguments
+    and shift the column positions by one.
+    
+    Args:
+        raw_data_dir (str): Path to raw data directory
+        name (str): Dataset name (clients, pets, services, revenue)
+        skiprows, header, usecols, skipfooter: Layout of the Excel export
+        
+    Returns:
+        pd.DataFrame: Raw dataframe with the selected columns
+    """
+    path = raw_file_path(raw_data_dir, name)
+    if path.endswith(".jsonl"):
+        df = pd.read_json(path, lines=True, dtype=False)
+        if usecols is not None:
+            df = df.iloc[:, [col - 1 for col in usecols]]
+        return df
+    try:
+        df = read_vendor_xlsx(path, skiprows=skiprows, header=header, usecols=usecols)
+    except (ValueError, KeyError, zipfile.BadZipFile) as e:
+        logger.warning(f"⚠️ Fast xlsx reader failed on {path} ({e}), falling back to read_excel")
+        df = pd.read_excel(path, skiprows=skiprows, header=header, usecols=usecols)
+    if skipfooter:
+        df = df.iloc[:-skipfooter]
+    return df
 
 def clean_clients_data(raw_data_dir, clean_data_dir):
     """
@@ -31,10 +80,10 @@ def clean_clients_data(raw_data_dir, clean_data_dir):
     """
     try:
         logger.info("Loading Clients Data...")
-        clients_df = pd.read_excel(os.path.join(raw_data_dir, "clients.xlsx"), skiprows=4, usecols=[1,2,3,4,5])
+        clients_df = read_raw(raw_data_dir, "clients", skiprows=4, usecols=[1,2,3,4,5])
         clients_df.columns = ["name", "id", "phone", "creation_date", "status"]
         clients_df["creation_date"] = pd.to_datetime(clients_df["creation_date"])
-        clients_df["phone"] = clients_df["phone"].astype(str).str.split(".").str[0]
+        clients_df["phone"], clients_df["phone_key"] = canonical_phones(clients_df["phone"])
         
         # Save cleaned data
         os.makedirs(clean_data_dir, exist_ok=True)
@@ -63,10 +112,10 @@ def clean_pets_data(raw_data_dir, clean_data_dir):
     """
     try:
         logger.info("Loading Pets Data...")
-        pets_df = pd.read_excel(os.path.join(raw_data_dir, "pets.xlsx"), skiprows=4, header=None, usecols=[1,2,3,4,5,7])
+        pets_df = read_raw(raw_data_dir, "pets", skiprows=4, header=None, usecols=[1,2,3,4,5,7])
         pets_df.columns = ["pet_name", "code", "creation_date", "status", "type", "client_phone"]
         pets_df["creation_date"] = pd.to_datetime(pets_df["creation_date"])
-        pets_df["client_phone"] = pets_df["client_phone"].astype(str).str.split(".").str[0]
+        pets_df["client_phone"], pets_df["client_phone_key"] = canonical_phones(pets_df["client_phone"])
         
         # Save cleaned data
         os.makedirs(clean_data_dir, exist_ok=True)
@@ -95,15 +144,14 @@ def clean_services_data(raw_data_dir, clean_data_dir):
     """
     try:
         logger.info("Loading Services Data...")
-        services_df = pd.read_excel(os.path.join(raw_data_dir, "services.xlsx"), skiprows=5, header=None, usecols=[1, 2, 3, 4, 5, 7])
+        services_df = read_raw(raw_data_dir, "services", skiprows=5, header=None, usecols=[1, 2, 3, 4, 5, 7])
         services_df.columns = ["category", "service", "quantity", "cost", "sale_price", "creation_date"]
         services_df["creation_date"] = pd.to_datetime(services_df["creation_date"])
         services_df["quantity"] = pd.to_numeric(services_df["quantity"], errors='coerce')
         services_df["cost"] = pd.to_numeric(services_df["cost"], errors='coerce')
         services_df["sale_price"] = pd.to_numeric(services_df["sale_price"], errors='coerce')
         services_df = services_df.dropna(subset=["sale_price"])
-        services_df['doctor'] = services_df['service'].map(assign_doctor)
-        services_df['service'] = services_df['service'].map(lambda x: "كشف" if "كشف" in str(x) else x)
+        services_df['service'], services_df['doctor'] = normalize_services(services_df['service'])
         
         # Save cleaned data
         os.makedirs(clean_data_dir, exist_ok=True)
@@ -132,12 +180,12 @@ def clean_revenue_data(raw_data_dir, clean_data_dir):
     """
     try:
         logger.info("Loading Revenue Data...")
-        revenue_df = pd.read_excel(os.path.join(raw_data_dir, "revenue.xlsx"), skiprows=5, header=None, usecols=[1,2,3,4,5,6,7,8,10,11])
+        revenue_df = read_raw(raw_data_dir, "revenue", skiprows=5, header=None, usecols=[1,2,3,4,5,6,7,8,10,11], skipfooter=2)
         revenue_df.columns = ["creation_date", "category", "client", "client_phone", "pet_name", "invoice_code", "amount", "discount", "paid", "debit"]
-        revenue_df = revenue_df.iloc[:-2]
-        revenue_df["client_phone"] = revenue_df["client_phone"].astype(str).str.split(".").str[0]
+        revenue_df["client_phone"], revenue_df["client_phone_key"] = canonical_phones(revenue_df["client_phone"])
         revenue_df["creation_date"] = pd.to_datetime(revenue_df["creation_date"])
-        revenue_df = revenue_df.dropna()
+        # An invoice without a client phone is still a valid invoice
+        revenue_df = revenue_df.dropna(subset=revenue_df.columns.drop(["client_phone", "client_phone_key"]))
         
         # Save cleaned data
         os.makedirs(clean_data_dir, exist_ok=True)
@@ -176,36 +224,409 @@ def print_loading_summary(clients_df, pets_df, services_df, revenue_df, inventor
     logger.info(f"Expenses: {'❌ Not loaded' if expenses_df is None else '✅ Loaded'}")
     logger.info("="*50 + "\n")
 
+# Dataset name -> columns identifying a record. Services rows have no id of
+# their own and are identified by a hash of the whole normalized row.
+DEDUP_KEYS = {
+    "clients": ["id"],
+    "pets": ["code"],
+    "services": ["row_hash"],
+    "revenue": ["invoice_code"]
+}
+
+# Keyed tables merged through upsert_dataset()
+UPSERT_TABLES = ("clients", "pets", "revenue")
+
+# Phone column of each table; canonical_phones() adds <column>_key next to it
+PHONE_COLUMNS = {"clients": "phone", "pets": "client_phone", "revenue": "client_phone"}
+
+def fill_default_doctor(df):
+    """
+    Give services rows without a doctor the cleaner's default doctor.
+    
+    The old CSV database read the default "NA" back as a missing value, so
+    those stored rows must be filled before they are hashed or compared with
+    freshly cleaned ones.
+    """
+    missing = df["doctor"].isna()
+    if not missing.any():
+        return df
+    default_doctor = load_matcher().default_doctor
+    doctor = df["doctor"]
+    if isinstance(doctor.dtype, pd.CategoricalDtype) and default_doctor not in doctor.cat.categories:
+        doctor = doctor.cat.add_categories([default_doctor])
+    return df.assign(doctor=doctor.fillna(default_doctor))
+
+# Columns the services row_hash covers: every schema column but the hash itself
+SERVICES_HASH_COLUMNS = [column for column in TABLE_SCHEMAS["services"] if column != "row_hash"]
+
+def add_row_hash(df):
+    """
+    Add the services row_hash column: a stable 64-bit hash of the normalized row.
+    
+    Normalization (see key_index.normalize_column) makes 1 and 1.0, or a
+    Timestamp and its text, hash the same, so format drift between runs no
+    longer creates duplicate rows.
+    """
+    df = fill_default_doctor(df).copy()
+    df["row_hash"] = row_hashes(df, SERVICES_HASH_COLUMNS)
+    return df
+
+def deduplicate(name, df):
+    """Drop repeated records of a dataset, keeping the first occurrence (the newest data)."""
+    return df.drop_duplicates(subset=DEDUP_KEYS[name])
+
+def upsert_dataset(storage, name, new_df):
+    """
+    Merge a cleaned frame into a keyed master table without rewriting it.
+    
+    New keys (looked up in the persisted key index) are appended to the table.
+    Rows whose key exists with different values (e.g. an invoice that got
+    paid) replace the stored row; only then are stored rows read and
+    rewritten, limited to the dates of the changed rows.
+    Unchanged rows are skipped, so the weekly cost follows the new data,
+    not the size of the table.
+    
+    Args:
+        storage (Storage): Master table storage
+        name (str): Keyed dataset (clients, pets, revenue)
+        new_df (pd.DataFrame): Cleaned rows of this run
+        
+    Returns:
+        tuple: (rows appended, rows replaced)
+    """
+    key_columns = DEDUP_KEYS[name]
+    new_df = deduplicate(name, new_df)
+    
+    if storage.native_upsert:
+        # The backend enforces the key itself (SQLite INSERT ... ON CONFLICT)
+        return storage.upsert(name, new_df)
+    
+    if not storage.exists(name):
+        storage.write(name, new_df)
+        load_key_index(storage, name, key_columns)
+        return len(new_df), 0
+    
+    index = load_key_index(storage, name, key_columns)
+    keys = key_values(new_df, key_columns)
+    fingerprints = row_fingerprints(new_df)
+    stored = keys.map(index)
+    is_new = stored.isna()
+    is_changed = ~is_new & (stored != fingerprints)
+    
+    if is_changed.any():
+        # Stored versions of changed rows normally share their creation_date,
+        # so only that date range (partitions, for partitioned tables) is rewritten
+        changed_df = new_df[is_changed]
+        changed_keys = set(keys[is_changed])
+        date_from, date_to = changed_df["creation_date"].min(), changed_df["creation_date"].max()
+        db_df = storage.read(name, date_from=date_from, date_to=date_to)
+        is_stale = key_values(db_df, key_columns).isin(changed_keys)
+        if is_stale.sum() == len(changed_keys):
+            storage.replace(name, pd.concat([db_df[~is_stale], changed_df], ignore_index=True), date_from, date_to)
+        else:
+            # A record moved to another date: rewrite the whole table
+            db_df = storage.read(name)
+            db_df = db_df[~key_values(db_df, key_columns).isin(changed_keys)]
+            storage.write(name, pd.concat([db_df, changed_df], ignore_index=True))
+    if is_new.any():
+        storage.append(name, new_df[is_new])
+    
+    touched = is_new | is_changed
+    if touched.any():
+        index.update(zip(keys[touched], fingerprints[touched]))
+        save_key_index(storage, name, index, key_columns)
+    return int(is_new.sum()), int(is_changed.sum())
+
+def load_migrations():
+    """
+    Load the one-time migrations already applied to the master tables.
+    
+    Returns:
+        dict: migration name -> format it was applied with
+    """
+    if not os.path.exists(MIGRATIONS_FILE):
+        return {}
+    try:
+        with open(MIGRATIONS_FILE, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading {MIGRATIONS_FILE}, migrations will be checked again: {e}")
+        return {}
+
+def record_migration(name, version):
+    """Persist that a one-time migration was applied with the given format (atomic replace)."""
+    migrations = load_migrations()
+    migrations[name] = version
+    os.makedirs(os.path.dirname(MIGRATIONS_FILE), exist_ok=True)
+    tmp_path = MIGRATIONS_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(migrations, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MIGRATIONS_FILE)
+
+def add_row_hash_to_table(storage):
+    """
+    One-time migration: (re)hash and deduplicate the stored services table.
+    
+    Runs once per HASH_FORMAT, recorded in MIGRATIONS_FILE: when the table
+    has no row_hash yet, was hashed with an older format, or was hashed
+    before missing doctors were filled (those rows never matched freshly
+    cleaned ones). After that only the file is checked, not the table.
+    """
+    if not storage.exists("services"):
+        return
+    if (load_migrations().get("services_row_hash") == HASH_FORMAT
+            and "row_hash" in storage.columns("services")):
+        return
+    services_df = storage.read("services")
+    deduped_df = deduplicate("services", add_row_hash(services_df))
+    storage.write("services", deduped_df)
+    record_migration("services_row_hash", HASH_FORMAT)
+    logger.info(f"🔑 Hashed services rows ({len(services_df) - len(deduped_df)} duplicate rows removed)")
+    if storage.exists("services_daily"):
+        build_rollup(storage, "services_daily")
+
+def add_phone_keys_to_table(storage, name):
+    """One-time migration: canonicalize a table stored before phone keys and add its key column."""
+    column = PHONE_COLUMNS[name]
+    if not storage.exists(name) or f"{column}_key" in storage.columns(name):
+        return
+    df = storage.read(name)
+    df[column], df[f"{column}_key"] = canonical_phones(df[column])
+    storage.write(name, df)
+    logger.info(f"🔑 Canonicalized {name}.{column} and added {column}_key")
+
 def merge_and_save(clients_df, pets_df, services_df, revenue_df):
     
-    #load master data
-    database_dir = os.path.join(os.getcwd(), "database")
-    db_clients = pd.read_csv(os.path.join(database_dir, "clients.csv"))
-    db_pets = pd.read_csv(os.path.join(database_dir, "pets.csv"))
-    db_services = pd.read_csv(os.path.join(database_dir, "services.csv"))
-    db_revenue = pd.read_csv(os.path.join(database_dir, "revenue.csv"))
+    storage = get_storage()
+    # Tables still kept as database/<name>.csv from before a backend switch are imported here, not on read
+    storage.migrate(list(CLEANERS) + list(ROLLUPS))
+    batches = {name: df for name, df in [("clients", clients_df), ("pets", pets_df), ("revenue", revenue_df)]
+               if df is not None}
+    # Every stored table, not just the batch's: the client index reads clients, pets and revenue
+    for name in PHONE_COLUMNS:
+        add_phone_keys_to_table(storage, name)
+    
+    # Loaded (and validated) before the upserts, so the batches can be applied to it afterwards
+    client_index = load_client_index(storage) if batches else None
+    # Dates the batch's records had before the merge, for the rollups of re-dated records
+    previous_dates = {name: stored_dates(client_index, name, df) for name, df in batches.items()} if batches else {}
+    
+    #upsert keyed tables through the key index
+    for name, df in batches.items():
+        appended, replaced = upsert_dataset(storage, name, df)
+        logger.info(f"💾 {name}: {appended} rows appended, {replaced} rows updated")
+    
+    if client_index is not None:
+        save_client_index(storage, update_client_index(client_index, batches))
+        logger.info(f"🗂️ Client index updated: {len(client_index['by_client'])} clients")
+    
+    #services: append the rows whose row_hash isn't stored yet
+    if services_df is not None:
+        add_row_hash_to_table(storage)
+        services_df = deduplicate("services", add_row_hash(services_df))
+        date_from, date_to = services_df["creation_date"].min(), services_df["creation_date"].max()
+        if pd.isna(date_from):
+            date_from = date_to = None
+        if not storage.exists("services"):
+            storage.write("services", services_df)
+            record_migration("services_row_hash", HASH_FORMAT)
+        else:
+            # Identical rows share their creation_date, so only that range needs checking
+            stored = storage.find_existing("services", "row_hash", services_df["row_hash"], date_from, date_to)
+            services_df = services_df[~services_df["row_hash"].isin(stored)]
+            if len(services_df):
+                storage.append("services", services_df)
+        logger.info(f"💾 services: {len(services_df)} rows appended")
+        batches["services"] = services_df
+    
+    #refresh the daily rollups of the days these batches touched
+    update_rollups(storage, batches, previous_dates)
 
-    #extend data
-    clients_df = pd.concat([clients_df, db_clients], ignore_index=True)
-    pets_df = pd.concat([pets_df, db_pets], ignore_index=True)
-    services_df = pd.concat([services_df, db_services], ignore_index=True)
-    revenue_df = pd.concat([revenue_df, db_revenue], ignore_index=True)
+# Dataset name -> cleaner, in processing order
+CLEANERS = {
+    "clients": clean_clients_data,
+    "pets": clean_pets_data,
+    "services": clean_services_data,
+    "revenue": clean_revenue_data
+}
 
-    #remove any duplicates 
-    clients_df=clients_df.drop_duplicates(subset=["id"])
-    pets_df=pets_df.drop_duplicates(subset=["code"])
-    revenue_df=revenue_df.drop_duplicates(subset=["invoice_code"])
-    services_df = services_df.drop_duplicates()
+def cleaner_version(name):
+    """
+    Version tag of a cleaner: hash of its source plus PARSE_CACHE_VERSION.
+    
+    Editing a clean_*_data function invalidates only that dataset's cache
+    entries; bump PARSE_CACHE_VERSION when a shared helper (read_raw,
+    normalize_services, ...) changes. Services also depend on the contents
+    of service_rules.json.
+    """
+    source = inspect.getsource(CLEANERS[name])
+    if name == "services":
+        source += rules_version()
+    return hashlib.sha256(f"{PARSE_CACHE_VERSION}:{source}".encode()).hexdigest()[:12]
 
-    #save extended data
-    clients_df.to_csv(os.path.join(database_dir, "clients.csv"), index=False)
-    pets_df.to_csv(os.path.join(database_dir, "pets.csv"), index=False)
-    services_df.to_csv(os.path.join(database_dir, "services.csv"), index=False)
-    revenue_df.to_csv(os.path.join(database_dir, "revenue.csv"), index=False)
+def run_cleaner(name, raw_data_dir, clean_data_dir, use_cache=True):
+    """
+    Run one cleaner, reusing the cached result for an identical raw file.
+    
+    Cleaned frames are pickled under data/cache/<name>/ keyed by the raw
+    payload hash and cleaner_version(), so a hit skips parsing the workbook.
+    Either way the frame is cast to its schema.TABLE_SCHEMAS dtypes here, once,
+    before it is merged.
+    
+    Returns:
+        pd.DataFrame or None: Cleaned dataframe with the declared dtypes
+    """
+    raw_path = raw_file_path(raw_data_dir, name)
+    cache_path = None
+    if use_cache and os.path.exists(raw_path):
+        cache_key = f"{payload_sha256(raw_path)}-{cleaner_version(name)}"
+        cache_path = os.path.join(PARSE_CACHE_DIR, name, f"{cache_key}.pkl")
+        if os.path.exists(cache_path):
+            try:
+                df = pd.read_pickle(cache_path)
+                os.makedirs(clean_data_dir, exist_ok=True)
+                df.to_csv(os.path.join(clean_data_dir, f"{name}.csv"), index=False)
+                logger.info(f"✅ {name.title()} loaded from cache: {df.shape}")
+                return apply_schema(name, df)
+            except Exception as e:
+                logger.warning(f"⚠️ Ignoring unreadable cache entry {cache_path}: {e}")
+    
+    df = CLEANERS[name](raw_data_dir, clean_data_dir)
+    
+    if df is not None and cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+    return apply_schema(name, df)
 
+def clean_datasets(raw_data_dir, clean_data_dir, names=None, parallel=True, max_workers=MAX_PROCESS_WORKERS):
+    """
+    Run the cleaners of the given datasets, in parallel worker processes by default.
+    
+    The cleaners are independent and mostly spend their time parsing the
+    workbook, so each one runs in its own process (see run_cleaner for the
+    parse cache). parallel=False runs them one after
+    another in this process, in CLEANERS order (useful for debugging).
+    
+    Args:
+        raw_data_dir (str): Path to raw data directory
+        clean_data_dir (str): Path to clean data directory
+        names (list): Datasets to clean (defaults to all CLEANERS)
+        parallel (bool): Use a process pool
+        max_workers (int): Maximum number of worker processes
+        
+    Returns:
+        dict: dataset name -> cleaned dataframe or None, in CLEANERS order
+    """
+    names = [name for name in CLEANERS if names is None or name in names]
     
+    if not parallel or len(names) < 2 or max_workers < 2:
+        return {name: run_cleaner(name, raw_data_dir, clean_data_dir) for name in names}
     
-def main():
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(names))) as executor:
+        futures = {name: executor.submit(run_cleaner, name, raw_data_dir, clean_data_dir) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+def find_raw_days(raw_root=None):
+    """
+    List every raw snapshot directory (data/raw/YYYY/MM/DD), oldest first.
+    
+    Args:
+        raw_root (str): Root of the raw store (defaults to data/raw)
+        
+    Returns:
+        list: (date, raw_data_dir, clean_data_dir) tuples sorted by date
+    """
+    raw_root = raw_root or os.path.join(DATASETS_DIR, "raw")
+    days = []
+    for dirpath, dirnames, _ in os.walk(raw_root):
+        dirnames.sort()
+        parts = os.path.relpath(dirpath, raw_root).split(os.sep)
+        if len(parts) != 3:
+            continue
+        try:
+            day = datetime.strptime("/".join(parts), "%Y/%m/%d")
+        except ValueError:
+            continue
+        dirnames.clear()
+        clean_data_dir = os.path.join(DATASETS_DIR, "clean", *parts)
+        days.append((day, dirpath, clean_data_dir))
+    return sorted(days)
+
+def rebuild(storage=None, max_workers=MAX_PROCESS_WORKERS):
+    """
+    Rebuild the database from scratch out of every raw snapshot.
+    
+    All (day, dataset) pairs are cleaned in one process pool. The results are
+    then stacked newest day first and deduplicated like merge_and_save does,
+    so the latest snapshot of a record wins exactly as if the days had been
+    merged one by one - but each table is written only once.
+    
+    Args:
+        storage (Storage): Where to write the tables (defaults to get_storage())
+        max_workers (int): Maximum number of worker processes
+        
+    Returns:
+        dict: dataset name -> rebuilt dataframe (None if no day had that dataset)
+    """
+    storage = storage or get_storage()
+    days = find_raw_days()
+    if not days:
+        raise FileNotFoundError(f"No raw data directories under {os.path.join(DATASETS_DIR, 'raw')}")
+    logger.info(f"🔁 Rebuilding database from {len(days)} raw days ({days[0][0]:%Y-%m-%d} to {days[-1][0]:%Y-%m-%d})")
+    
+    tasks = []
+    raw_paths = {}
+    for day, raw_data_dir, clean_data_dir in days:
+        for name in CLEANERS:
+            raw_path = raw_file_path(raw_data_dir, name)
+            if os.path.exists(raw_path):
+                tasks.append((day, name, raw_data_dir, clean_data_dir))
+                raw_paths[(day, name)] = raw_path
+    
+    with ProcessPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [(day, name, executor.submit(run_cleaner, name, raw_data_dir, clean_data_dir))
+                   for day, name, raw_data_dir, clean_data_dir in tasks]
+        results = [(day, name, future.result()) for day, name, future in futures]
+    
+    # Newest day first, so deduplicate() keeps the latest version of each record
+    frames = {name: [] for name in CLEANERS}
+    for day, name, df in sorted(results, key=lambda result: result[0], reverse=True):
+        if df is None:
+            logger.warning(f"⚠️ Skipping {name} of {day:%Y-%m-%d}: cleaning failed")
+            continue
+        frames[name].append(df)
+    
+    rebuilt = {}
+    for name in CLEANERS:
+        if not frames[name]:
+            logger.warning(f"⚠️ No raw {name} data found, leaving the {name} table untouched")
+            rebuilt[name] = None
+            continue
+        # Categories differ from day to day, so the concatenated columns need recasting
+        df = apply_schema(name, pd.concat(frames[name], ignore_index=True))
+        if name == "services":
+            df = add_row_hash(df)
+        df = deduplicate(name, df)
+        storage.write(name, df)
+        if name == "services":
+            record_migration("services_row_hash", HASH_FORMAT)
+        if name in UPSERT_TABLES and not storage.native_upsert:
+            index = dict(zip(key_values(df, DEDUP_KEYS[name]), row_fingerprints(df)))
+            save_key_index(storage, name, index, DEDUP_KEYS[name])
+        rebuilt[name] = df
+        logger.info(f"✅ {name} table rebuilt from {len(frames[name])} days: {df.shape}")
+    
+    save_client_index(storage, build_client_index(storage))
+    build_rollups(storage)
+    
+    for day, _, _ in days:
+        mark_processed({name: raw_paths[(result_day, name)]
+                        for result_day, name, df in results if result_day == day and df is not None})
+    return rebuilt
+
+def main(parallel=True):
     """Main execution function to load all datasets."""
     now = datetime.now()
     year = now.strftime("%Y")
@@ -223,11 +644,25 @@ def main():
     
     logger.info(f"Loading data from: {raw_data_dir}")
     
-    # Load all datasets
-    clients_df = clean_clients_data(raw_data_dir, clean_data_dir)
-    pets_df = clean_pets_data(raw_data_dir, clean_data_dir)
-    services_df = clean_services_data(raw_data_dir, clean_data_dir)
-    revenue_df = clean_revenue_data(raw_data_dir, clean_data_dir)
+    # Load all datasets, skipping workbooks whose content was already merged
+    raw_paths = {}
+    pending = []
+    for name in CLEANERS:
+        raw_path = raw_file_path(raw_data_dir, name)
+        if os.path.exists(raw_path):
+            if is_processed(payload_sha256(raw_path)):
+                logger.info(f"⏭️ {os.path.basename(raw_path)} already merged (same content hash), skipping")
+                continue
+            raw_paths[name] = raw_path
+        pending.append(name)
+    
+    cleaned = clean_datasets(raw_data_dir, clean_data_dir, pending, parallel)
+    loaded = {name: cleaned.get(name) for name in CLEANERS}
+    
+    clients_df = loaded["clients"]
+    pets_df = loaded["pets"]
+    services_df = loaded["services"]
+    revenue_df = loaded["revenue"]
     
     # Inventory and Expenses not available from API yet
     inventory_df = None
@@ -237,11 +672,25 @@ def main():
     print_loading_summary(clients_df, pets_df, services_df, revenue_df, inventory_df, expenses_df)
     
     #extend data
-    merge_and_save(clients_df, pets_df, services_df, revenue_df)
+    if all(df is None for df in loaded.values()):
+        logger.info("No new data to merge.")
+    else:
+        merge_and_save(clients_df, pets_df, services_df, revenue_df)
+        mark_processed({name: path for name, path in raw_paths.items() if loaded[name] is not None})
     
     return clients_df, pets_df, services_df, revenue_df, inventory_df, expenses_df
 
 
 # Execute main function when script is run
 if __name__ == "__main__":
-    clients_df, pets_df, services_df, revenue_df, inventory_df, expenses_df = main()
+    parser = argparse.ArgumentParser(description="Clean today's raw data and merge it into the database.")
+    parser.add_argument("--serial", action="store_true",
+                        help="Clean the datasets one after another in this process (for debugging)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the database from every raw day under data/raw (after cleaning logic changes)")
+    args = parser.parse_args()
+    
+    if args.rebuild:
+        rebuild(max_workers=1 if args.serial else MAX_PROCESS_WORKERS)
+    else:
+        clients_df, pets_df, services_df, revenue_df, inventory_df, expenses_df = main(parallel=not args.serial)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import zipfile
+from datetime import datetime
+from Constants import DATASETS_DIR, RAW_MANIFEST_FILE
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONTENT-ADDRESSED RAW MANIFEST
+# ==========================================
+
+_manifest_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the hex sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def payload_sha256(path):
+    """
+    Return the content hash of a raw payload.
+
+    xlsx files are zip archives whose entries carry the export time, so two
+    downloads of identical data differ byte-wise. For zips, hash the
+    decompressed parts (minus docProps metadata) instead of the archive.
+    """
+    if not zipfile.is_zipfile(path):
+        return file_sha256(path)
+
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(path) as archive:
+        for name in sorted(archive.namelist()):
+            if name.startswith("docProps/"):
+                continue
+            digest.update(name.encode())
+            with archive.open(name) as part:
+                for chunk in iter(lambda: part.read(1024 * 1024), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest():
+    """
+    Load the raw payload manifest.
+
+    Returns:
+        dict: sha256 -> {"dataset", "path" (relative to data/), "ingested_at", "processed"}
+    """
+    if not os.path.exists(RAW_MANIFEST_FILE):
+        return {}
+    try:
+        with open(RAW_MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading raw manifest, treating every payload as new: {e}")
+        return {}
+
+
+def _save_manifest(manifest):
+    os.makedirs(os.path.dirname(RAW_MANIFEST_FILE), exist_ok=True)
+    tmp_path = RAW_MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, RAW_MANIFEST_FILE)
+
+
+def find_payload(digest):
+    """Return the absolute path a payload with this hash was saved to, or None."""
+    entry = load_manifest().get(digest)
+    if entry is None:
+        return None
+    return os.path.join(DATASETS_DIR, entry["path"])
+
+
+def record_payload(digest, dataset, path):
+    """Register a newly saved payload under its content hash."""
+    with _manifest_lock:
+        manifest = load_manifest()
+        manifest[digest] = {
+            "dataset": dataset,
+            "path": os.path.relpath(path, DATASETS_DIR),
+            "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            "processed": False
+        }
+        _save_manifest(manifest)
+
+
+def is_processed(digest):
+    """True if a payload with this hash was already merged into the database."""
+    return load_manifest().get(digest, {}).get("processed", False)
+
+
+def mark_processed(paths):
+    """
+    Flag raw files as merged so identical payloads are not re-parsed.
+
+    Args:
+        paths (dict): dataset name -> raw file path
+    """
+    with _manifest_lock:
+        manifest = load_manifest()
+        for dataset, path in paths.items():
+            digest = payload_sha256(path)
+            entry = manifest.setdefault(digest, {
+                "dataset": dataset,
+                "path": os.path.relpath(path, DATASETS_DIR),
+                "ingested_at": datetime.now().isoformat(timespec="seconds")
+            })
+            entry["processed"] = True
+        _save_manifest(manifest)
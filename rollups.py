@@ -0,0 +1,148 @@
+import logging
+import pandas as pd
+from schema import apply_schema
+from storage import DATE_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# DAILY ROLLUP TABLES
+# ==========================================
+# Pre-aggregated copies of the master tables, one row per day and group,
+# stored next to them (database/<rollup>.*) through the same storage
+# backend. The day is kept in creation_date, so date range reads and
+# replace() work on rollups exactly like on the tables they summarize.
+# merge_and_save recomputes only the days its batches touched; the
+# dashboard's KPIs and trends read these few thousand rows instead of the
+# raw revenue and services history.
+
+# Rollup -> source table, group columns and metrics (output -> (source column, aggregation))
+ROLLUPS = {
+    "revenue_daily": {
+        "source": "revenue",
+        "by": ["category"],
+        "metrics": {"invoices": ("invoice_code", "count"), "amount": ("amount", "sum"),
+                    "discount": ("discount", "sum"), "paid": ("paid", "sum"), "debit": ("debit", "sum")}
+    },
+    "services_daily": {
+        "source": "services",
+        "by": ["service", "doctor"],
+        "metrics": {"rows": ("sale_price", "count"), "quantity": ("quantity", "sum"),
+                    "cost": ("cost", "sum"), "costs": ("cost", "count"), "sale_price": ("sale_price", "sum")}
+    },
+    "clients_daily": {
+        "source": "clients",
+        "by": ["status"],
+        "metrics": {"new_clients": ("id", "count")}
+    },
+    "pets_daily": {
+        "source": "pets",
+        "by": ["type"],
+        "metrics": {"new_pets": ("code", "count")}
+    }
+}
+
+
+def _source_columns(spec):
+    return list(dict.fromkeys([DATE_COLUMN] + spec["by"] + [column for column, _ in spec["metrics"].values()]))
+
+
+def _is_current(storage, name):
+    """True if a rollup is stored with every column ROLLUPS declares for it (not from before a metric was added)."""
+    spec = ROLLUPS[name]
+    return storage.exists(name) and set([DATE_COLUMN] + spec["by"] + list(spec["metrics"])) <= set(storage.columns(name))
+
+
+def compute_rollup(name, df):
+    """
+    Aggregate source rows into a rollup: one row per day and group.
+
+    Args:
+        name (str): Rollup name (a ROLLUPS key)
+        df (pd.DataFrame): Rows of its source table
+
+    Returns:
+        pd.DataFrame: creation_date (the day), group columns and metrics
+    """
+    spec = ROLLUPS[name]
+    day = df[DATE_COLUMN].dt.normalize().rename(DATE_COLUMN)
+    groups = [day] + [df[column] for column in spec["by"]]
+    rolled = df.groupby(groups, observed=True, dropna=False).agg(**spec["metrics"]).reset_index()
+    return rolled.sort_values(DATE_COLUMN, ignore_index=True)
+
+
+def build_rollup(storage, name):
+    """(Re)build a whole rollup from its source table."""
+    spec = ROLLUPS[name]
+    if not storage.exists(spec["source"]):
+        return
+    rolled = compute_rollup(name, storage.read(spec["source"], columns=_source_columns(spec)))
+    storage.write(name, rolled)
+    logger.info(f"📊 {name} rollup built: {len(rolled)} rows")
+
+
+def build_rollups(storage):
+    """Rebuild every rollup from the stored tables (after a rebuild of the database)."""
+    for name in ROLLUPS:
+        build_rollup(storage, name)
+
+
+def update_rollups(storage, batches, previous_dates=None):
+    """
+    Recompute the rollup rows of the days touched by merged batches.
+
+    For each touched source table, only the rows of the batch's days are
+    read back (one date range read) and re-aggregated; the stored rollup
+    rows of those days are replaced and every other day is left as is. A
+    rollup that doesn't exist yet, or lacks a metric, is built from its
+    whole source table once.
+
+    Args:
+        storage (Storage): Master table storage
+        batches (dict): source table name -> rows merged into it this run
+        previous_dates (dict): source table name -> creation_dates the batch's
+            records had before the merge; a re-dated invoice changes its old day too
+    """
+    previous_dates = previous_dates or {}
+    for name, spec in ROLLUPS.items():
+        batch = batches.get(spec["source"])
+        if batch is None or not storage.exists(spec["source"]):
+            continue
+        if not _is_current(storage, name):
+            build_rollup(storage, name)
+            continue
+        dates = pd.concat([batch[DATE_COLUMN], previous_dates.get(spec["source"], batch[DATE_COLUMN].iloc[:0])])
+        days = pd.DatetimeIndex(dates.dropna().dt.normalize().unique())
+        if not len(days):
+            continue
+        date_from, date_to = days.min(), days.max()
+
+        source = storage.read(spec["source"], columns=_source_columns(spec), date_from=date_from, date_to=date_to)
+        fresh = compute_rollup(name, source[source[DATE_COLUMN].dt.normalize().isin(days)])
+        # Untouched days between the first and last touched day keep their stored rows
+        stored = storage.read(name, date_from=date_from, date_to=date_to)
+        kept = stored[~stored[DATE_COLUMN].isin(days)]
+        storage.replace(name, pd.concat([kept, fresh], ignore_index=True).sort_values(DATE_COLUMN, ignore_index=True),
+                        date_from, date_to)
+        logger.info(f"📊 {name} rollup updated for {len(days)} days")
+
+
+def read_rollup(storage, name, date_from=None, date_to=None):
+    """
+    Read a rollup's rows of a date range.
+
+    Never writes: rollups are built by process_data. Until then (or while a
+    stored rollup lacks a metric) the rows are aggregated from the source
+    table's date range in memory.
+
+    Returns:
+        pd.DataFrame
+    """
+    if _is_current(storage, name):
+        return storage.read(name, date_from=date_from, date_to=date_to)
+    spec = ROLLUPS[name]
+    if not storage.exists(spec["source"]):
+        return pd.DataFrame()
+    logger.warning(f"⚠️ {name} rollup is missing or outdated, aggregating {spec['source']} (run process_data.py)")
+    source = storage.read(spec["source"], columns=_source_columns(spec), date_from=date_from, date_to=date_to)
+    return apply_schema(name, compute_rollup(name, source))
@@ -0,0 +1,150 @@
+import logging
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# COLUMN TYPES OF THE CLEANED TABLES
+# ==========================================
+# The cleaners return whatever read_vendor_xlsx/read_json inferred: repeated
+# labels as str, ids as float after a missing value, phones as text. Every
+# cleaned frame and every table read back from storage goes through
+# apply_schema(), so process_data and the dashboard always get the same
+# compact dtypes whatever backend the table came from.
+#
+# "category" is used for low-cardinality labels, nullable Int32/Int64 for
+# ids and phone keys (exports can leave them empty), float32 for quantities.
+# Phones themselves are display text (phones.canonical_phones), since the
+# leading zero matters.
+# Money stays float64: float32 sums drift by whole pounds over a year of
+# invoices.
+
+DATETIME = "datetime"
+
+TABLE_SCHEMAS = {
+    "clients": {
+        "name": "str",
+        "id": "Int32",
+        "phone": "str",
+        "creation_date": DATETIME,
+        "status": "category",
+        "phone_key": "Int64"
+    },
+    "pets": {
+        "pet_name": "str",
+        "code": "Int32",
+        "creation_date": DATETIME,
+        "status": "category",
+        "type": "category",
+        "client_phone": "str",
+        "client_phone_key": "Int64"
+    },
+    "services": {
+        "category": "category",
+        "service": "category",
+        "quantity": "float32",
+        "cost": "float64",
+        "sale_price": "float64",
+        "creation_date": DATETIME,
+        "doctor": "category",
+        "row_hash": "int64"
+    },
+    "revenue": {
+        "creation_date": DATETIME,
+        "category": "category",
+        "client": "str",
+        "client_phone": "str",
+        "pet_name": "str",
+        "invoice_code": "Int32",
+        "amount": "float64",
+        "discount": "float64",
+        "paid": "float64",
+        "debit": "float64",
+        "client_phone_key": "Int64"
+    },
+    # Daily rollups (rollups.py); creation_date holds the day
+    "revenue_daily": {
+        "creation_date": DATETIME,
+        "category": "category",
+        "invoices": "int64",
+        "amount": "float64",
+        "discount": "float64",
+        "paid": "float64",
+        "debit": "float64"
+    },
+    "services_daily": {
+        "creation_date": DATETIME,
+        "service": "category",
+        "doctor": "category",
+        "rows": "int64",
+        "quantity": "float64",
+        "cost": "float64",
+        "costs": "int64",
+        "sale_price": "float64"
+    },
+    "clients_daily": {
+        "creation_date": DATETIME,
+        "status": "category",
+        "new_clients": "int64"
+    },
+    "pets_daily": {
+        "creation_date": DATETIME,
+        "type": "category",
+        "new_pets": "int64"
+    }
+}
+
+
+def text_columns(name):
+    """Columns of a table declared as text, which CSV readers must not parse as numbers."""
+    return [column for column, dtype in TABLE_SCHEMAS.get(name, {}).items() if dtype == "str"]
+
+
+def _convert(name, series, dtype):
+    if dtype == DATETIME:
+        if is_datetime64_any_dtype(series):
+            return series
+        return pd.to_datetime(series, format="mixed")
+    if dtype == "category":
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        return series.astype("category")
+    if series.dtype == dtype:
+        return series
+    if dtype == "str":
+        # Before pandas 3, astype(str) turns missing values into the text "nan"
+        return series.astype(dtype).where(series.notna())
+    # Numbers may arrive as text ("1001234567", "2578.0") or as floats after a missing value
+    numbers = pd.to_numeric(series, errors="coerce")
+    invalid = numbers.isna() & series.notna()
+    if invalid.any():
+        logger.warning(f"⚠️ {name}.{series.name}: {int(invalid.sum())} non-numeric values set to missing, "
+                       f"e.g. {series[invalid].unique()[:5].tolist()}")
+    return numbers.astype(dtype)
+
+
+def apply_schema(name, df):
+    """
+    Cast a table's columns to the dtypes declared in TABLE_SCHEMAS.
+
+    Columns the schema doesn't list (and tables it doesn't know, like
+    expenses) are left as they are; columns already of the right dtype are
+    not copied.
+
+    Args:
+        name (str): Table name (clients, pets, services, revenue)
+        df (pd.DataFrame): Cleaned or stored rows of that table
+
+    Returns:
+        pd.DataFrame: df with the declared dtypes
+    """
+    schema = TABLE_SCHEMAS.get(name)
+    if df is None or not schema:
+        return df
+    converted = {column: _convert(name, df[column], dtype)
+                 for column, dtype in schema.items() if column in df.columns}
+    changed = {column: series for column, series in converted.items() if series is not df[column]}
+    if not changed:
+        return df
+    return df.assign(**changed)
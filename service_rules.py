@@ -0,0 +1,122 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from Constants import SERVICE_RULES_FILE
+
+# ==========================================
+# SERVICE NAME NORMALIZATION RULES
+# ==========================================
+# service_rules.json decides how raw names from the services export become
+# the service and doctor columns:
+#
+#   "exact"           {"raw name": "service"}: whole-name renames, checked first
+#   "rules"           [{"contains": text | "regex": pattern, "service": name}]:
+#                     tried in order, the first one matching anywhere in the
+#                     name wins
+#   "doctor_pattern"  regex whose first group is the doctor in a raw name
+#   "default_doctor"  doctor of names the pattern doesn't match
+#   "doctor_aliases"  {"spelling": "doctor"}: merges spellings of one doctor
+#
+# The rules are compiled once per process into a single combined regex plus
+# dict lookups and evaluated per distinct name, never per row. Editing them
+# changes cleaned values (and services row hashes), so run
+# `process_data.py --rebuild` afterwards.
+
+
+class ServiceMatcher:
+    """The rules of service_rules.json, compiled."""
+
+    def __init__(self, rules):
+        self.exact = rules.get("exact", {})
+        self.services = []
+        alternatives = []
+        for position, rule in enumerate(rules.get("rules", [])):
+            if "contains" in rule:
+                pattern = re.escape(rule["contains"])
+            elif "regex" in rule:
+                pattern = rule["regex"]
+            else:
+                raise ValueError(f"Service rule {position} needs a 'contains' or 'regex' pattern: {rule}")
+            # re.match tries the alternatives in order, each over the whole
+            # name (.*?), so the first matching rule wins
+            alternatives.append(f"(?P<rule{position}>.*?(?:{pattern}))")
+            self.services.append(rule["service"])
+        self.pattern = re.compile("|".join(alternatives), re.DOTALL) if alternatives else None
+        self.doctor_pattern = re.compile(rules.get("doctor_pattern", r"^[^-]*-([^-]+)"))
+        self.default_doctor = rules.get("default_doctor", "NA")
+        self.doctor_aliases = rules.get("doctor_aliases", {})
+
+    def service(self, name):
+        """Normalized service of one raw name."""
+        if name in self.exact:
+            return self.exact[name]
+        if self.pattern is not None:
+            match = self.pattern.match(name)
+            if match:
+                return self.services[int(match.lastgroup[len("rule"):])]
+        return name
+
+    def doctor(self, name):
+        """Doctor of one raw name."""
+        match = self.doctor_pattern.search(name)
+        if not match or not match.group(1):
+            return self.default_doctor
+        doctor = match.group(1)
+        return self.doctor_aliases.get(doctor, doctor)
+
+
+def rules_version(path=SERVICE_RULES_FILE):
+    """Hash of the rules file, so cleaned frames cached under older rules are not reused."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+@lru_cache(maxsize=None)
+def load_matcher(path=SERVICE_RULES_FILE):
+    """
+    Load and compile the rules file (once per process).
+
+    Returns:
+        ServiceMatcher
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    except FileNotFoundError:
+        # Not a missing export: don't let clean_services_data report it as one
+        raise RuntimeError(f"Service rules file not found: {path}")
+    return ServiceMatcher(rules)
+
+
+def _broadcast(values, codes, index):
+    """Expand one value per distinct name to the rows, as a categorical built from the name codes."""
+    value_codes, categories = pd.factorize(pd.Series(values, dtype=object))
+    return pd.Series(pd.Categorical.from_codes(value_codes[codes], categories), index=index)
+
+
+def normalize_services(services, matcher=None):
+    """
+    Derive the normalized service name and the doctor from raw service names.
+
+    The raw names are factorized; the matcher runs once per distinct name
+    and the results reach the rows through the integer codes, so the cost
+    follows the size of the catalog rather than the number of rows.
+
+    Args:
+        services (pd.Series): Raw service names
+        matcher (ServiceMatcher): Compiled rules (defaults to load_matcher())
+
+    Returns:
+        tuple: (normalized service names, doctors) as categorical Series aligned with services
+    """
+    matcher = matcher or load_matcher()
+    codes, names = pd.factorize(services)
+    names = [str(name) for name in names]
+    # Missing names (code -1) point at an extra trailing slot
+    codes = np.where(codes < 0, len(names), codes)
+    normalized = [matcher.service(name) for name in names] + [np.nan]
+    doctors = [matcher.doctor(name) for name in names] + [matcher.default_doctor]
+    return _broadcast(normalized, codes, services.index), _broadcast(doctors, codes, services.index)
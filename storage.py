@@ -0,0 +1,768 @@
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import sqlite3
+from contextlib import closing
+import pandas as pd
+from pandas.api.types import infer_dtype, is_datetime64_any_dtype
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # only needed by ParquetStorage
+    pq = None
+from Constants import DATABASE_DIR, STORAGE_BACKEND, PARTITIONED_TABLES, SQLITE_FILENAME
+from schema import apply_schema, text_columns
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# MASTER TABLE STORAGE
+# ==========================================
+# process_data and the dashboard read and write database/<name>.* only
+# through these classes. CsvStorage is the original text format;
+# ParquetStorage keeps dtypes (datetimes, categoricals, ints) so tables load
+# without re-parsing; SqliteStorage adds keys, indexes and transactional upserts.
+# All of them can export a table as CSV. Whatever the backend, read()
+# returns the dtypes declared in schema.TABLE_SCHEMAS.
+#
+# Switching backends is a migration process_data runs (Storage.migrate):
+# database/<name>.csv is imported and renamed to <name>.csv.imported, so
+# the stale copy isn't mistaken for the table. Reads never write; until the
+# migration runs they read the old layout.
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_COLUMNS = ("creation_date", "date")
+
+# Column the date range arguments (date_from/date_to) and partitions refer to
+DATE_COLUMN = "creation_date"
+
+
+def filter_dates(df, date_from=None, date_to=None):
+    """
+    Keep the rows whose DATE_COLUMN falls in [date_from, date_to].
+
+    Both bounds are inclusive days (date_to=2026-05-16 keeps 2026-05-16 23:59);
+    None leaves that side open.
+    """
+    if (date_from is None and date_to is None) or DATE_COLUMN not in df.columns:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if date_from is not None:
+        mask &= df[DATE_COLUMN] >= pd.Timestamp(date_from).normalize()
+    if date_to is not None:
+        mask &= df[DATE_COLUMN] < pd.Timestamp(date_to).normalize() + pd.Timedelta(days=1)
+    return df[mask]
+
+
+class Storage:
+    """Common interface of the storage backends."""
+
+    extension = ""
+    # True if the backend implements upsert() itself (no key index needed)
+    native_upsert = False
+
+    def __init__(self, database_dir=DATABASE_DIR):
+        self.database_dir = database_dir
+
+    def path(self, name):
+        """Path of a table's file."""
+        return os.path.join(self.database_dir, f"{name}{self.extension}")
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def version(self, name):
+        """
+        Token that changes whenever the stored table changes (used to validate indexes).
+
+        Size and modification time together: a same-width value edit keeps the size.
+        """
+        stat = os.stat(self.path(name))
+        return f"{self.extension}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def read(self, name, columns=None, date_from=None, date_to=None):
+        """
+        Read a table, optionally only the rows of a date range.
+
+        Args:
+            name (str): Table name (clients, pets, services, revenue, ...)
+            columns (list): Columns to load (None loads all)
+            date_from, date_to: Inclusive creation_date range (None = open)
+
+        Returns:
+            pd.DataFrame: Table with the schema.TABLE_SCHEMAS dtypes
+        """
+        raise NotImplementedError
+
+    def write(self, name, df):
+        """Replace a table with df (atomically)."""
+        raise NotImplementedError
+
+    def append(self, name, df):
+        """Add rows to a table, creating it if needed."""
+        raise NotImplementedError
+
+    def replace(self, name, df, date_from=None, date_to=None):
+        """
+        Replace the stored rows of a date range with df.
+
+        Stored rows outside [date_from, date_to] are kept; df holds the
+        complete new content of the range.
+        """
+        if not self.exists(name):
+            return self.write(name, df)
+        stored = self.read(name)
+        outside = stored.drop(filter_dates(stored, date_from, date_to).index)
+        self.write(name, pd.concat([outside, df[stored.columns]], ignore_index=True))
+
+    def columns(self, name):
+        """Return a table's column names."""
+        return list(self.read(name).columns)
+
+    def find_existing(self, name, column, values, date_from=None, date_to=None):
+        """
+        Return the subset of values already stored in a column.
+
+        Args:
+            name (str): Table name
+            column (str): Column to look values up in (e.g. services row_hash)
+            values: Values to look up
+            date_from, date_to: Only look at stored rows of this creation_date range
+
+        Returns:
+            set
+        """
+        stored = self.read(name, columns=[column], date_from=date_from, date_to=date_to)[column]
+        return set(stored[stored.isin(values)])
+
+    def date_bounds(self, name):
+        """Return the (min, max) creation_date of a table."""
+        dates = self.read(name, columns=[DATE_COLUMN])[DATE_COLUMN]
+        return dates.min(), dates.max()
+
+    def migrate(self, names):
+        """Import tables still stored in an older layout into this backend (nothing to do for CSV)."""
+
+    def export_csv(self, name, target):
+        """Write a table as CSV to a path or file-like object."""
+        self.read(name).to_csv(target, index=False, date_format=TIMESTAMP_FORMAT)
+
+
+class CsvStorage(Storage):
+    """Tables as database/<name>.csv."""
+
+    extension = ".csv"
+
+    def read(self, name, columns=None, date_from=None, date_to=None):
+        read_columns = columns
+        if columns is not None and DATE_COLUMN not in columns and (date_from is not None or date_to is not None):
+            read_columns = list(columns) + [DATE_COLUMN]
+        # Only empty fields are missing: "NA" is a real value (doctor column).
+        # Text columns stay text, so phones keep their leading zero.
+        df = pd.read_csv(self.path(name), usecols=read_columns, keep_default_na=False, na_values=[""],
+                         dtype={column: "str" for column in text_columns(name)})
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format="mixed")
+        df = filter_dates(df, date_from, date_to)
+        return apply_schema(name, df if read_columns is columns else df[columns])
+
+    def columns(self, name):
+        return list(pd.read_csv(self.path(name), nrows=0).columns)
+
+    def write(self, name, df):
+        os.makedirs(self.database_dir, exist_ok=True)
+        tmp_path = self.path(name) + ".tmp"
+        df.to_csv(tmp_path, index=False, date_format=TIMESTAMP_FORMAT)
+        os.replace(tmp_path, self.path(name))
+
+    def append(self, name, df):
+        if not self.exists(name):
+            return self.write(name, df)
+        columns = pd.read_csv(self.path(name), nrows=0).columns
+        df[columns].to_csv(self.path(name), mode="a", header=False, index=False, date_format=TIMESTAMP_FORMAT)
+
+
+def retire_csv(database_dir, name):
+    """Rename database/<name>.csv to <name>.csv.imported once another backend holds the table."""
+    path = os.path.join(database_dir, f"{name}.csv")
+    if os.path.exists(path):
+        os.replace(path, path + ".imported")
+        logger.info(f"📦 {name}.csv renamed to {name}.csv.imported; the table now lives in another backend")
+
+
+def _arrow_safe(df):
+    """
+    Make object columns holding mixed Python types (e.g. phones parsed as int
+    from CSV next to str from a fresh export) storable as one Arrow type.
+    """
+    mixed = [column for column in df.columns
+             if df[column].dtype == object and infer_dtype(df[column], skipna=True) in ("mixed", "mixed-integer")]
+    if not mixed:
+        return df
+    df = df.copy()
+    for column in mixed:
+        df[column] = df[column].map(lambda value: value if pd.isna(value) else str(value))
+    return df
+
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    _arrow_safe(df).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _month_groups(df):
+    """Split rows by creation_date month: {(year, month): rows}, (0, 0) for undated rows."""
+    dates = df[DATE_COLUMN]
+    years = dates.dt.year.fillna(0).astype(int)
+    months = dates.dt.month.fillna(0).astype(int)
+    return {key: rows for key, rows in df.groupby([years, months], sort=True)}
+
+
+def _month_in_range(year, month, date_from=None, date_to=None):
+    if year == 0:
+        # Undated rows never match a date filter
+        return date_from is None and date_to is None
+    if date_from is not None:
+        date_from = pd.Timestamp(date_from)
+        if (year, month) < (date_from.year, date_from.month):
+            return False
+    if date_to is not None:
+        date_to = pd.Timestamp(date_to)
+        if (year, month) > (date_to.year, date_to.month):
+            return False
+    return True
+
+
+class ParquetStorage(Storage):
+    """
+    Tables as Parquet files (requires pyarrow).
+
+    PARTITIONED_TABLES are stored one file per creation_date month, as
+    database/<name>/year=YYYY/month=MM/part.parquet: date range reads only
+    open the months they need and writes only rewrite the months they touch.
+    Other tables are single database/<name>.parquet files; Parquet can't be
+    appended to in place, so append() rewrites them.
+
+    A table that only exists as CSV (or as a single file, for a table that
+    became partitioned) is read from there until migrate() imports it.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, database_dir=DATABASE_DIR, partitioned_tables=PARTITIONED_TABLES):
+        super().__init__(database_dir)
+        self.partitioned_tables = set(partitioned_tables)
+
+    def _is_partitioned(self, name):
+        return name in self.partitioned_tables
+
+    def _table_dir(self, name):
+        return os.path.join(self.database_dir, name)
+
+    @staticmethod
+    def _partition_path(table_dir, year, month):
+        return os.path.join(table_dir, f"year={year:04d}", f"month={month:02d}", "part.parquet")
+
+    def _partitions(self, name):
+        """List a partitioned table's (year, month, path), oldest first."""
+        partitions = []
+        table_dir = self._table_dir(name)
+        if not os.path.isdir(table_dir):
+            return partitions
+        for year_dir in os.listdir(table_dir):
+            if not year_dir.startswith("year="):
+                continue
+            for month_dir in os.listdir(os.path.join(table_dir, year_dir)):
+                path = os.path.join(table_dir, year_dir, month_dir, "part.parquet")
+                if month_dir.startswith("month=") and os.path.exists(path):
+                    partitions.append((int(year_dir[5:]), int(month_dir[6:]), path))
+        return sorted(partitions)
+
+    def _legacy(self, name):
+        """Storage still holding a table in an older layout (CSV, or one file for a partitioned table), or None."""
+        if self._is_partitioned(name):
+            if os.path.isdir(self._table_dir(name)):
+                return None
+            if os.path.exists(self.path(name)):
+                return ParquetStorage(self.database_dir, partitioned_tables=())
+        elif os.path.exists(self.path(name)):
+            return None
+        csv_storage = CsvStorage(self.database_dir)
+        return csv_storage if csv_storage.exists(name) else None
+
+    def _import(self, name):
+        """Rewrite a table stored in an older layout as Parquet."""
+        legacy = self._legacy(name)
+        if legacy is None:
+            return
+        source = os.path.basename(legacy.path(name))
+        self.write(name, legacy.read(name))
+        layout = f"{name}/ (partitioned by month)" if self._is_partitioned(name) else os.path.basename(self.path(name))
+        logger.info(f"📦 Imported {source} into {layout}")
+
+    def migrate(self, names):
+        for name in names:
+            self._import(name)
+
+    def exists(self, name):
+        return (os.path.isdir(self._table_dir(name)) or super().exists(name)
+                or CsvStorage(self.database_dir).exists(name))
+
+    def version(self, name):
+        legacy = self._legacy(name)
+        if legacy is not None:
+            return legacy.version(name)
+        if not self._is_partitioned(name):
+            return super().version(name)
+        stats = [(path, os.stat(path)) for _, _, path in self._partitions(name)]
+        digest = hashlib.sha256(repr([(os.path.relpath(path, self.database_dir), stat.st_size, stat.st_mtime_ns)
+                                      for path, stat in stats]).encode()).hexdigest()[:16]
+        return f"{self.extension}:{len(stats)}:{digest}"
+
+    def columns(self, name):
+        legacy = self._legacy(name)
+        if legacy is not None:
+            return legacy.columns(name)
+        if not self._is_partitioned(name):
+            return pq.read_schema(self.path(name)).names
+        partitions = self._partitions(name)
+        return pq.read_schema(partitions[0][2]).names if partitions else []
+
+    def read(self, name, columns=None, date_from=None, date_to=None):
+        legacy = self._legacy(name)
+        if legacy is not None:
+            return legacy.read(name, columns, date_from, date_to)
+        read_columns = columns
+        if columns is not None and DATE_COLUMN not in columns and (date_from is not None or date_to is not None):
+            read_columns = list(columns) + [DATE_COLUMN]
+
+        if not self._is_partitioned(name):
+            df = pd.read_parquet(self.path(name), columns=read_columns)
+        else:
+            # Partition pruning: only open the months overlapping the range
+            partitions = self._partitions(name)
+            paths = [path for year, month, path in partitions if _month_in_range(year, month, date_from, date_to)]
+            if not paths:
+                if not partitions:
+                    return apply_schema(name, pd.DataFrame(columns=columns))
+                # Empty frame with the table's columns and dtypes
+                return apply_schema(name, pd.read_parquet(partitions[0][2], columns=columns).iloc[:0])
+            frames = [pd.read_parquet(path, columns=read_columns) for path in paths]
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+        df = filter_dates(df, date_from, date_to)
+        if read_columns is not columns:
+            df = df[columns]
+        return apply_schema(name, df)
+
+    def write(self, name, df):
+        if not self._is_partitioned(name):
+            _write_parquet(df, self.path(name))
+        else:
+            self._write_partitions(name, df)
+        # The whole table is written: a CSV left from before the switch is stale
+        retire_csv(self.database_dir, name)
+
+    def _write_partitions(self, name, df):
+        # Build the new partitions next to the table, then swap the directories
+        table_dir = self._table_dir(name)
+        tmp_dir = table_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for (year, month), rows in _month_groups(df).items():
+            _write_parquet(rows, self._partition_path(tmp_dir, year, month))
+        shutil.rmtree(table_dir, ignore_errors=True)
+        os.replace(tmp_dir, table_dir)
+        if os.path.exists(self.path(name)):
+            # Single-file layout of the same table, superseded by the partitions
+            os.remove(self.path(name))
+
+    def append(self, name, df):
+        if not self.exists(name):
+            return self.write(name, df)
+        if not self._is_partitioned(name):
+            self._import(name)
+            stored = self.read(name)
+            return self.write(name, pd.concat([stored, df[stored.columns]], ignore_index=True))
+        self._import(name)
+        # Rewrite only the months the new rows fall in
+        for (year, month), rows in _month_groups(df).items():
+            path = self._partition_path(self._table_dir(name), year, month)
+            if os.path.exists(path):
+                stored = pd.read_parquet(path)
+                rows = pd.concat([stored, rows[stored.columns]], ignore_index=True)
+            _write_parquet(rows, path)
+
+    def replace(self, name, df, date_from=None, date_to=None):
+        if not self._is_partitioned(name) or not self.exists(name):
+            return super().replace(name, df, date_from, date_to)
+        self._import(name)
+        table_dir = self._table_dir(name)
+        new_rows = _month_groups(df)
+        touched = {(year, month) for year, month, _ in self._partitions(name)
+                   if _month_in_range(year, month, date_from, date_to)}
+        for year, month in sorted(touched | set(new_rows)):
+            path = self._partition_path(table_dir, year, month)
+            parts = []
+            if os.path.exists(path):
+                stored = pd.read_parquet(path)
+                parts.append(stored.drop(filter_dates(stored, date_from, date_to).index))
+            if (year, month) in new_rows:
+                parts.append(new_rows[(year, month)])
+            rows = pd.concat(parts, ignore_index=True)
+            if len(rows):
+                _write_parquet(rows, path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def date_bounds(self, name):
+        legacy = self._legacy(name)
+        if legacy is not None:
+            return legacy.date_bounds(name)
+        if not self._is_partitioned(name):
+            return super().date_bounds(name)
+        dated = [path for year, _, path in self._partitions(name) if year]
+        if not dated:
+            return pd.NaT, pd.NaT
+        first = pd.read_parquet(dated[0], columns=[DATE_COLUMN])[DATE_COLUMN]
+        last = pd.read_parquet(dated[-1], columns=[DATE_COLUMN])[DATE_COLUMN]
+        return first.min(), last.max()
+
+
+# Column types, primary key and indexes of the SQLite tables, matching
+# schema.TABLE_SCHEMAS. Dates are stored as TIMESTAMP_FORMAT text, which
+# sorts and compares chronologically.
+SQLITE_TABLES = {
+    "clients": {
+        "columns": {"name": "TEXT", "id": "INTEGER", "phone": "TEXT", "creation_date": "TEXT", "status": "TEXT",
+                    "phone_key": "INTEGER"},
+        "key": "id",
+        "indexes": ["creation_date", "phone_key"]
+    },
+    "pets": {
+        "columns": {"pet_name": "TEXT", "code": "INTEGER", "creation_date": "TEXT", "status": "TEXT",
+                    "type": "TEXT", "client_phone": "TEXT", "client_phone_key": "INTEGER"},
+        "key": "code",
+        "indexes": ["creation_date", "client_phone_key"]
+    },
+    "services": {
+        "columns": {"category": "TEXT", "service": "TEXT", "quantity": "REAL", "cost": "REAL",
+                    "sale_price": "REAL", "creation_date": "TEXT", "doctor": "TEXT", "row_hash": "INTEGER"},
+        "key": None,
+        "indexes": ["creation_date", "service", "row_hash"]
+    },
+    "revenue": {
+        "columns": {"creation_date": "TEXT", "category": "TEXT", "client": "TEXT", "client_phone": "TEXT",
+                    "pet_name": "TEXT", "invoice_code": "INTEGER", "amount": "REAL", "discount": "REAL",
+                    "paid": "REAL", "debit": "REAL", "client_phone_key": "INTEGER"},
+        "key": "invoice_code",
+        "indexes": ["creation_date", "client_phone_key"]
+    },
+    "revenue_daily": {
+        "columns": {"creation_date": "TEXT", "category": "TEXT", "invoices": "INTEGER", "amount": "REAL",
+                    "discount": "REAL", "paid": "REAL", "debit": "REAL"},
+        "key": None,
+        "indexes": ["creation_date"]
+    },
+    "services_daily": {
+        "columns": {"creation_date": "TEXT", "service": "TEXT", "doctor": "TEXT", "rows": "INTEGER",
+                    "quantity": "REAL", "cost": "REAL", "costs": "INTEGER", "sale_price": "REAL"},
+        "key": None,
+        "indexes": ["creation_date"]
+    },
+    "clients_daily": {
+        "columns": {"creation_date": "TEXT", "status": "TEXT", "new_clients": "INTEGER"},
+        "key": None,
+        "indexes": ["creation_date"]
+    },
+    "pets_daily": {
+        "columns": {"creation_date": "TEXT", "type": "TEXT", "new_pets": "INTEGER"},
+        "key": None,
+        "indexes": ["creation_date"]
+    }
+}
+
+class SqliteStorage(Storage):
+    """
+    Tables in one embedded SQLite database (database/master.sqlite).
+
+    Keyed tables have their key as PRIMARY KEY, so upsert() is a single
+    transactional INSERT ... ON CONFLICT DO UPDATE and needs no key index.
+    Date ranges run as SQL on the creation_date index. Tables that only
+    exist as CSV are read from there until migrate() (or a first write)
+    imports them; reads use read-only connections.
+    """
+
+    extension = ".sqlite"
+    native_upsert = True
+
+    def __init__(self, database_dir=DATABASE_DIR, db_path=None):
+        super().__init__(database_dir)
+        self.db_path = db_path or os.path.join(database_dir, SQLITE_FILENAME)
+
+    def _reader(self, name):
+        """Read-only connection to the database if it holds the table, else None."""
+        if not os.path.exists(self.db_path):
+            return None
+        conn = sqlite3.connect(f"{pathlib.Path(os.path.abspath(self.db_path)).as_uri()}?mode=ro", uri=True)
+        if self._table_exists(conn, name):
+            return conn
+        conn.close()
+        return None
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        return conn
+
+    @staticmethod
+    def _schema(name):
+        if name not in SQLITE_TABLES:
+            raise ValueError(f"No SQLite schema for table {name!r}")
+        return SQLITE_TABLES[name]
+
+    def _table_exists(self, conn, name):
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    def _create(self, conn, name, only_columns=None):
+        """Create a table (limited to only_columns, for a CSV import that predates a schema column)."""
+        schema = self._schema(name)
+        columns = [column for column in schema["columns"] if only_columns is None or column in only_columns]
+        # The key is declared INT, not INTEGER: an INTEGER PRIMARY KEY would
+        # alias the rowid, and SQLite would make up a value for a NULL key
+        definitions = ", ".join(
+            f'"{column}" INT NOT NULL PRIMARY KEY' if column == schema["key"] else f'"{column}" {schema["columns"][column]}'
+            for column in columns
+        )
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({definitions})')
+        for column in schema["indexes"]:
+            if column in columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{name}_{column}" ON "{name}" ("{column}")')
+
+    @staticmethod
+    def _table_columns(conn, name):
+        return [row[1] for row in conn.execute(f'PRAGMA table_info("{name}")')]
+
+    def _ensure(self, conn, name):
+        """Create a table, importing database/<name>.csv into it if there is one."""
+        if self._table_exists(conn, name):
+            return
+        csv_storage = CsvStorage(self.database_dir)
+        if not csv_storage.exists(name):
+            self._create(conn, name)
+        else:
+            df = csv_storage.read(name)
+            self._create(conn, name, only_columns=df.columns)
+            schema = self._schema(name)
+            if schema["key"]:
+                # First occurrence wins, like merge_and_save
+                df = df.drop_duplicates(subset=[schema["key"]])
+            self._insert(conn, name, df)
+            self._bump_version(conn, name)
+            conn.commit()
+            logger.info(f"📦 Imported {name}.csv into {os.path.basename(self.db_path)}")
+            retire_csv(self.database_dir, name)
+
+    def _bump_version(self, conn, name):
+        conn.execute("INSERT INTO table_versions (name, version) VALUES (?, 1) "
+                     "ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,))
+
+    def _records(self, name, df):
+        """Rows of df as tuples in schema column order, dates as text and NaN as NULL."""
+        columns = [column for column in self._schema(name)["columns"] if column in df.columns]
+        df = df[columns].copy()
+        for column in columns:
+            if is_datetime64_any_dtype(df[column]):
+                df[column] = df[column].dt.strftime(TIMESTAMP_FORMAT)
+        df = df.astype(object).where(df.notna(), None)
+        return columns, list(df.itertuples(index=False, name=None))
+
+    def _without_null_keys(self, name, df):
+        """Drop rows whose key is missing: they can't be bound as a PRIMARY KEY."""
+        key = self._schema(name)["key"]
+        if not key or key not in df.columns:
+            return df
+        missing = df[key].isna()
+        if missing.any():
+            logger.warning(f"⚠️ Skipping {int(missing.sum())} {name} rows without {key}")
+            df = df[~missing]
+        return df
+
+    def _insert(self, conn, name, df, upsert=False):
+        columns, records = self._records(name, self._without_null_keys(name, df))
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f'INSERT INTO "{name}" ({column_list}) VALUES ({placeholders})'
+        key = self._schema(name)["key"]
+        if upsert and key:
+            values = [column for column in columns if column != key]
+            assignments = ", ".join(f'"{column}" = excluded."{column}"' for column in values)
+            current = ", ".join(f'"{column}"' for column in values)
+            incoming = ", ".join(f'excluded."{column}"' for column in values)
+            # Only touch rows whose values actually changed
+            sql += f' ON CONFLICT("{key}") DO UPDATE SET {assignments} WHERE ({current}) IS NOT ({incoming})'
+        conn.executemany(sql, records)
+
+    @staticmethod
+    def _date_clause(date_from, date_to):
+        clauses, params = [], []
+        if date_from is not None:
+            clauses.append(f'"{DATE_COLUMN}" >= ?')
+            params.append(pd.Timestamp(date_from).normalize().strftime(TIMESTAMP_FORMAT))
+        if date_to is not None:
+            clauses.append(f'"{DATE_COLUMN}" < ?')
+            params.append((pd.Timestamp(date_to).normalize() + pd.Timedelta(days=1)).strftime(TIMESTAMP_FORMAT))
+        return clauses, params
+
+    def _to_frame(self, df):
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format=TIMESTAMP_FORMAT)
+        return df
+
+    # --- interface ---
+
+    def path(self, name):
+        return self.db_path
+
+    def migrate(self, names):
+        names = [name for name in names if name in SQLITE_TABLES and CsvStorage(self.database_dir).exists(name)]
+        for name in names:
+            with closing(self._connect()) as conn, conn:
+                self._ensure(conn, name)
+
+    def exists(self, name):
+        if name not in SQLITE_TABLES:
+            return False
+        conn = self._reader(name)
+        if conn is not None:
+            conn.close()
+            return True
+        return CsvStorage(self.database_dir).exists(name)
+
+    def version(self, name):
+        conn = self._reader(name)
+        if conn is None:
+            return CsvStorage(self.database_dir).version(name)
+        with closing(conn):
+            row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (name,)).fetchone()
+        return f"{self.extension}:{row[0] if row else 0}"
+
+    def read(self, name, columns=None, date_from=None, date_to=None):
+        conn = self._reader(name)
+        if conn is None:
+            return CsvStorage(self.database_dir).read(name, columns, date_from, date_to)
+        clauses, params = self._date_clause(date_from, date_to)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(conn):
+            column_list = ", ".join(f'"{column}"' for column in columns or self._table_columns(conn, name))
+            df = pd.read_sql_query(f'SELECT {column_list} FROM "{name}"{where} ORDER BY rowid', conn, params=params)
+        return apply_schema(name, self._to_frame(df))
+
+    def columns(self, name):
+        conn = self._reader(name)
+        if conn is None:
+            return CsvStorage(self.database_dir).columns(name)
+        with closing(conn):
+            return self._table_columns(conn, name)
+
+    def find_existing(self, name, column, values, date_from=None, date_to=None):
+        # Exact lookups on the column's index, in chunks below SQLite's variable limit
+        conn = self._reader(name)
+        if conn is None:
+            return CsvStorage(self.database_dir).find_existing(name, column, values, date_from, date_to)
+        values = [value.item() if hasattr(value, "item") else value for value in pd.unique(pd.Series(values))]
+        found = set()
+        with closing(conn):
+            for start in range(0, len(values), 500):
+                chunk = values[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = conn.execute(f'SELECT DISTINCT "{column}" FROM "{name}" WHERE "{column}" IN ({placeholders})', chunk)
+                found.update(row[0] for row in rows)
+        return found
+
+    def write(self, name, df):
+        with closing(self._connect()) as conn, conn:
+            # Recreate rather than empty, so schema changes (new columns) apply
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            self._create(conn, name)
+            self._insert(conn, name, df, upsert=True)
+            self._bump_version(conn, name)
+        retire_csv(self.database_dir, name)
+
+    def append(self, name, df):
+        with closing(self._connect()) as conn, conn:
+            self._ensure(conn, name)
+            self._insert(conn, name, df, upsert=True)
+            self._bump_version(conn, name)
+
+    def replace(self, name, df, date_from=None, date_to=None):
+        clauses, params = self._date_clause(date_from, date_to)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn, conn:
+            self._ensure(conn, name)
+            conn.execute(f'DELETE FROM "{name}"{where}', params)
+            self._insert(conn, name, df, upsert=True)
+            self._bump_version(conn, name)
+
+    def upsert(self, name, df):
+        """
+        Insert new keys and update changed rows in one transaction.
+
+        Returns:
+            tuple: (rows inserted, rows updated)
+        """
+        key = self._schema(name)["key"]
+        df = self._without_null_keys(name, df)
+        keys = [int(value) for value in df[key].drop_duplicates()]
+        with closing(self._connect()) as conn, conn:
+            self._ensure(conn, name)
+            existing = 0
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                existing += conn.execute(f'SELECT COUNT(*) FROM "{name}" WHERE "{key}" IN ({placeholders})',
+                                         chunk).fetchone()[0]
+            before = conn.total_changes
+            self._insert(conn, name, df, upsert=True)
+            changed = conn.total_changes - before
+            inserted = len(keys) - existing
+            if changed:
+                self._bump_version(conn, name)
+        return inserted, changed - inserted
+
+    def date_bounds(self, name):
+        conn = self._reader(name)
+        if conn is None:
+            return CsvStorage(self.database_dir).date_bounds(name)
+        with closing(conn):
+            first, last = conn.execute(f'SELECT MIN("{DATE_COLUMN}"), MAX("{DATE_COLUMN}") FROM "{name}"').fetchone()
+        return pd.Timestamp(first) if first else pd.NaT, pd.Timestamp(last) if last else pd.NaT
+
+
+BACKENDS = {
+    "csv": CsvStorage,
+    "parquet": ParquetStorage,
+    "sqlite": SqliteStorage
+}
+
+
+def get_storage(backend=STORAGE_BACKEND, database_dir=DATABASE_DIR):
+    """
+    Return the storage backend configured by STORAGE_BACKEND.
+
+    Args:
+        backend (str): "csv", "parquet" or "sqlite"
+        database_dir (str): Directory holding the tables
+
+    Returns:
+        Storage
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](database_dir)
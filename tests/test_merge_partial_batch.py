@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+import client_index
+import key_index
+import process_data
+from phones import canonical_phones
+from storage import CsvStorage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """CSV storage in tmp_path holding tables stored before phone keys were added."""
+    storage = CsvStorage(str(tmp_path / "database"))
+    storage.write("clients", pd.DataFrame({
+        "name": ["هدى مصطفى", "رائد"],
+        "id": [2282, 2281],
+        "phone": ["1111111111", "1006077770"],
+        "creation_date": pd.to_datetime(["2026-05-15", "2026-05-14"]),
+        "status": ["Active", "Active"],
+    }))
+    storage.write("pets", pd.DataFrame({
+        "pet_name": ["ايس"],
+        "code": [2503],
+        "creation_date": pd.to_datetime(["2026-02-26"]),
+        "status": ["Active"],
+        "type": ["Dog"],
+        "client_phone": ["1006077770"],
+    }))
+    storage.write("revenue", pd.DataFrame({
+        "creation_date": pd.to_datetime(["2026-02-26 16:33:51"]),
+        "category": ["Boarding"],
+        "client": ["رائد"],
+        "client_phone": ["1006077770"],
+        "pet_name": ["ايس"],
+        "invoice_code": [2578],
+        "amount": [1000.0],
+        "discount": [0.0],
+        "paid": [1000.0],
+        "debit": [0.0],
+    }))
+    monkeypatch.setattr(process_data, "get_storage", lambda: storage)
+    monkeypatch.setattr(client_index, "CLIENT_INDEX_FILE", str(tmp_path / "state" / "client_index.pkl"))
+    monkeypatch.setattr(key_index, "KEY_INDEX_DIR", str(tmp_path / "state" / "key_index"))
+    return storage
+
+
+def test_clients_only_batch_migrates_every_phone_table(storage):
+    clients_df = pd.DataFrame({
+        "name": ["شريف ايهاب"],
+        "id": [2283],
+        "phone": ["1026852965"],
+        "creation_date": pd.to_datetime(["2026-05-16"]),
+        "status": ["Active"],
+    })
+    clients_df["phone"], clients_df["phone_key"] = canonical_phones(clients_df["phone"])
+
+    process_data.merge_and_save(clients_df, None, None, None)
+
+    for name, column in process_data.PHONE_COLUMNS.items():
+        assert f"{column}_key" in storage.columns(name)
+    assert sorted(storage.read("clients")["id"]) == [2281, 2282, 2283]
+    index = client_index.load_client_index(storage, save=False)
+    assert len(index["by_client"]) == 3
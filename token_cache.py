@@ -0,0 +1,103 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from Constants import TOKEN_CACHE_FILE, TOKEN_DEFAULT_TTL, TOKEN_EXPIRY_MARGIN
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# AUTH TOKEN CACHE
+# ==========================================
+
+# cache key -> {"token": str, "expires_at": epoch seconds}
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+
+def token_expiry(token):
+    """
+    Return the expiry (epoch seconds) from a JWT's `exp` claim.
+
+    The signature is not verified; the claim is only used to decide when to
+    sign in again. Falls back to now + TOKEN_DEFAULT_TTL for opaque tokens.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return time.time() + TOKEN_DEFAULT_TTL
+
+
+def _is_valid(entry):
+    return bool(entry) and entry.get("expires_at", 0) - TOKEN_EXPIRY_MARGIN > time.time()
+
+
+def _read_disk_cache(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable token cache {path}: {e}")
+        return {}
+
+
+def _write_disk_cache(path, cache):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def get_cached_token(key, path=TOKEN_CACHE_FILE):
+    """
+    Return a cached token for `key` that is not about to expire, or None.
+
+    Args:
+        key (str): Identifies the account/clinic the token belongs to
+        path (str): Optional on-disk cache shared across runs
+    """
+    with _cache_lock:
+        entry = _memory_cache.get(key)
+        if not _is_valid(entry) and path:
+            entry = _read_disk_cache(path).get(key)
+            if _is_valid(entry):
+                _memory_cache[key] = entry
+        return entry["token"] if _is_valid(entry) else None
+
+
+def store_token(key, token, path=TOKEN_CACHE_FILE):
+    """Cache a freshly issued token in memory and, if configured, on disk."""
+    entry = {"token": token, "expires_at": token_expiry(token)}
+    with _cache_lock:
+        _memory_cache[key] = entry
+        if path:
+            cache = _read_disk_cache(path)
+            cache[key] = entry
+            _write_disk_cache(path, cache)
+
+
+def invalidate_token(key, token=None, path=TOKEN_CACHE_FILE):
+    """
+    Drop the cached token for `key`.
+
+    If `token` is given, the entry is only dropped while it still holds that
+    token, so a token refreshed by another worker is kept.
+    """
+    with _cache_lock:
+        entry = _memory_cache.get(key)
+        if entry and (token is None or entry["token"] == token):
+            del _memory_cache[key]
+        if path:
+            cache = _read_disk_cache(path)
+            entry = cache.get(key)
+            if entry and (token is None or entry["token"] == token):
+                del cache[key]
+                _write_disk_cache(path, cache)
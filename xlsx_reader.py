@@ -0,0 +1,256 @@
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+import codecs
+from html import unescape
+from datetime import datetime, timedelta
+import numpy as np
+from pandas.io.parsers import TextParser
+
+# ==========================================
+# FAST READER FOR VENDOR EXPORT WORKBOOKS
+# ==========================================
+# The export reports are single-sheet workbooks with a few title/filter rows,
+# a header row and plain value cells. Instead of building openpyxl's full
+# workbook object model, stream the first worksheet's XML straight from the
+# zip, decode only the requested columns and hand the rows to the same
+# TextParser read_excel uses, so dtypes come out identical.
+
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Built-in number formats that display dates/times
+DATE_FORMAT_IDS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+DATE_TOKENS = re.compile(r"[dmyhs]", re.IGNORECASE)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+DIGITS = "0123456789"
+
+# Regexes over the worksheet XML. The export layout only uses plain
+# <row>/<c r="..">/<v>/<is><t> markup in the default namespace.
+TOKEN_RE = re.compile(r'<row\b([^>]*?)(/?)>|<c r="([A-Z]+)\d+"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+ROW_INDEX_RE = re.compile(r'\br="(\d+)"')
+VALUE_RE = re.compile(r"<v>([^<]*)</v>")
+TEXT_RE = re.compile(r"<t\b[^>]*>([^<]*)</t>")
+
+
+def _column_index(letters):
+    """Convert a column reference (A, B, ..., AA) to a 0-based index."""
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _first_sheet_path(archive):
+    """Resolve the first worksheet's part name from the workbook relationships."""
+    try:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        rel_id = workbook.find(f"{NS}sheets/{NS}sheet").get(f"{REL_NS}id")
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        for rel in rels.iter(f"{PKG_REL_NS}Relationship"):
+            if rel.get("Id") == rel_id:
+                target = rel.get("Target")
+                if target.startswith("/"):
+                    return target.lstrip("/")
+                return posixpath.normpath(posixpath.join("xl", target))
+    except (KeyError, AttributeError):
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+
+def _shared_strings(archive):
+    """Load the shared string table (plain and rich-text entries)."""
+    try:
+        source = archive.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, elem in ET.iterparse(source):
+            if elem.tag == f"{NS}si":
+                strings.append("".join(t.text or "" for t in elem.iter(f"{NS}t")))
+                elem.clear()
+    return strings
+
+
+def _date_styles(archive):
+    """Return the set of cell style indexes whose number format is a date."""
+    try:
+        styles = ET.fromstring(archive.read("xl/styles.xml"))
+    except KeyError:
+        return set()
+
+    custom_date_ids = set()
+    for fmt in styles.iter(f"{NS}numFmt"):
+        # Strip quoted literals and [colour]/[locale] sections before looking for date tokens
+        code = re.sub(r'"[^"]*"|\[[^\]]*\]', "", fmt.get("formatCode", ""))
+        if DATE_TOKENS.search(code):
+            custom_date_ids.add(int(fmt.get("numFmtId")))
+
+    cell_xfs = styles.find(f"{NS}cellXfs")
+    if cell_xfs is None:
+        return set()
+    date_styles = set()
+    for index, xf in enumerate(cell_xfs.findall(f"{NS}xf")):
+        fmt_id = int(xf.get("numFmtId", 0))
+        if fmt_id in DATE_FORMAT_IDS or fmt_id in custom_date_ids:
+            date_styles.add(index)
+    return date_styles
+
+
+def _decode(cell_type, text, style, shared_strings, date_styles):
+    """Decode a cell's raw text the way pandas' openpyxl reader reports it ("" if empty)."""
+    if cell_type == "inlineStr" or cell_type == "str":
+        return text
+    if not text:
+        return ""
+    if cell_type == "s":
+        return shared_strings[int(text)]
+    if cell_type == "d":
+        return datetime.fromisoformat(text)
+    if cell_type == "b":
+        return text == "1"
+    if cell_type == "e":
+        return np.nan
+
+    number = float(text)
+    if style in date_styles:
+        return EXCEL_EPOCH + timedelta(days=number)
+    # Integral numbers come back as int, like pandas does for openpyxl cells
+    return int(number) if number.is_integer() else number
+
+
+def _attr(attrs, name, default):
+    """Value of one attribute in a raw attribute string (' s="2" t="s"')."""
+    start = attrs.find(f' {name}="')
+    if start < 0:
+        return default
+    start += len(name) + 3
+    return attrs[start:attrs.index('"', start)]
+
+
+def _iter_tokens(archive, sheet_path, chunk_size=1024 * 1024):
+    """
+    Stream the worksheet XML and yield its row/cell tokens in document order.
+
+    Each token is (row_attrs, row_self_closing, col_letters, cell_attrs, cell_body);
+    row tokens have row_attrs set, cell tokens have col_letters set.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    seen_sheet_data = False
+    with archive.open(sheet_path) as source:
+        while True:
+            chunk = source.read(chunk_size)
+            buffer += decoder.decode(chunk, final=not chunk)
+            if not seen_sheet_data:
+                seen_sheet_data = "<sheetData" in buffer
+            # Only parse up to the last complete row; keep the rest for the next chunk
+            if chunk:
+                cut = buffer.rfind("</row>") + 6 if "</row>" in buffer else 0
+            else:
+                cut = len(buffer)
+            yield from TOKEN_RE.findall(buffer, 0, cut)
+            buffer = buffer[cut:]
+            if not chunk:
+                break
+    if not seen_sheet_data:
+        # Namespace-prefixed markup (<x:row>) or no sheet data at all
+        raise ValueError(f"Unsupported worksheet markup in {sheet_path}")
+
+
+def _sheet_rows(archive, sheet_path, shared_strings, date_styles, wanted_columns):
+    """
+    Return the sheet as a list of rows, shaped like pandas' openpyxl reader output.
+
+    Missing rows/cells are filled with "", trailing empty rows are dropped and
+    all rows are padded to the same width. Only cells in wanted_columns are
+    decoded; other cells are left as "" but still count as content.
+    """
+    data = []
+    width = 0
+    last_row_with_data = -1
+    column_cache = {}
+    row = None
+    row_index = -1
+
+    def close_row():
+        nonlocal width, last_row_with_data
+        if row:
+            last_row_with_data = row_index
+            width = max(width, len(row))
+        data.append(row)
+
+    for row_attrs, _, letters, cell_attrs, body in _iter_tokens(archive, sheet_path):
+        if not letters:
+            # New <row>: finish the previous one and fill skipped row numbers
+            if row is not None:
+                close_row()
+            row_ref = ROW_INDEX_RE.search(row_attrs)
+            row_index = int(row_ref.group(1)) - 1 if row_ref else len(data)
+            while len(data) < row_index:
+                data.append([])
+            row = []
+            continue
+        if not body:
+            continue
+
+        col_index = column_cache.get(letters)
+        if col_index is None:
+            col_index = column_cache[letters] = _column_index(letters)
+
+        if wanted_columns is not None and col_index not in wanted_columns:
+            value = None   # content we don't need: keeps the row and width
+        else:
+            cell_type = _attr(cell_attrs, "t", "n")
+            if cell_type == "inlineStr":
+                value = unescape("".join(TEXT_RE.findall(body)))
+            else:
+                if body.startswith("<v>") and body.endswith("</v>"):
+                    text = body[3:-4]
+                else:
+                    text = VALUE_RE.search(body)
+                    text = text.group(1) if text else ""
+                if cell_type == "str":
+                    text = unescape(text)
+                style = int(_attr(cell_attrs, "s", 0)) if date_styles else 0
+                value = _decode(cell_type, text, style, shared_strings, date_styles)
+        if value != "":
+            row.extend([""] * (col_index - len(row)))
+            row.append("" if value is None else value)
+
+    if row is not None:
+        close_row()
+    data = data[:last_row_with_data + 1]
+    return [row + [""] * (width - len(row)) for row in data]
+
+
+def read_vendor_xlsx(path, skiprows=None, header=0, usecols=None):
+    """
+    Read the first sheet of an export workbook, equivalent to pd.read_excel.
+
+    Cell decoding is done here; skiprows/header/usecols handling and dtype
+    inference go through the same TextParser that read_excel uses, so the
+    result matches read_excel for the arguments the cleaners pass.
+
+    Args:
+        path (str): Path to the .xlsx file
+        skiprows (int): Number of sheet rows to skip
+        header (int or None): Row (after skiprows) holding the column names
+        usecols (list[int]): 0-based column positions to keep (None keeps all)
+
+    Returns:
+        pd.DataFrame
+    """
+    wanted_columns = set(usecols) if usecols is not None else None
+
+    with zipfile.ZipFile(path) as archive:
+        shared_strings = _shared_strings(archive)
+        date_styles = _date_styles(archive)
+        data = _sheet_rows(archive, _first_sheet_path(archive), shared_strings, date_styles, wanted_columns)
+
+    parser = TextParser(data, header=header, skiprows=skiprows, usecols=usecols, skip_blank_lines=False)
+    return parser.read()